@@ -0,0 +1,283 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+import grpc
+from google.api_core.exceptions import GoogleAPICallError
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.errors import GoogleAdsException
+from google.ads.googleads.v16.errors.types.errors import GoogleAdsFailure
+from google.ads.googleads.interceptors import ExceptionInterceptor
+from google.auth.credentials import AnonymousCredentials
+from google.auth.transport.requests import Request
+from dotenv import load_dotenv
+from rate_limit import RateLimitScheduler
+from resilience import RetryPolicy, call_with_retries, bounded
+from metrics import observe_upstream, observe_queue_wait, watch_stats
+import tracing
+
+load_dotenv()
+
+# "fake" sends RPCs over plaintext gRPC to GOOGLE_ADS_FAKE_ADDRESS (see fakes/google_ads.py).
+GOOGLE_ADS_BACKEND = os.getenv("GOOGLE_ADS_BACKEND", "live")
+GOOGLE_ADS_FAKE_ADDRESS = os.getenv("GOOGLE_ADS_FAKE_ADDRESS", "localhost:50051")
+TOKEN_REFRESH_INTERVAL = float(os.getenv("GOOGLE_ADS_TOKEN_REFRESH_INTERVAL", "300"))
+TOKEN_REFRESH_MARGIN = timedelta(seconds=float(os.getenv("GOOGLE_ADS_TOKEN_REFRESH_MARGIN", "600")))
+CHANNEL_READY_TIMEOUT = float(os.getenv("GOOGLE_ADS_CHANNEL_READY_TIMEOUT", "5"))
+MAX_WORKERS = int(os.getenv("GOOGLE_ADS_MAX_WORKERS", "8"))
+RATE_LIMIT = float(os.getenv("GOOGLE_ADS_RATE_LIMIT", "10"))
+RATE_BURST = float(os.getenv("GOOGLE_ADS_RATE_BURST", "10"))
+CUSTOMER_RATE_LIMIT = float(os.getenv("GOOGLE_ADS_CUSTOMER_RATE_LIMIT", "1"))
+CUSTOMER_RATE_BURST = float(os.getenv("GOOGLE_ADS_CUSTOMER_RATE_BURST", "2"))
+MAX_QUEUE_WAIT = float(os.getenv("GOOGLE_ADS_MAX_QUEUE_WAIT", "30"))
+QUOTA_RETRIES = int(os.getenv("GOOGLE_ADS_QUOTA_RETRIES", "2"))
+QUOTA_DEFAULT_RETRY_DELAY = float(os.getenv("GOOGLE_ADS_QUOTA_RETRY_DELAY", "5"))
+CALL_TIMEOUT = float(os.getenv("GOOGLE_ADS_CALL_TIMEOUT", "30"))
+TRANSIENT_RETRIES = int(os.getenv("GOOGLE_ADS_TRANSIENT_RETRIES", "2"))
+
+FAILURE_METADATA_KEY = "google.ads.googleads.v16.errors.googleadsfailure-bin"
+TRANSIENT_CODES = {grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED, grpc.StatusCode.INTERNAL}
+# The quota wait is enforced by the blocked scheduler bucket, not by backoff.
+QUOTA_RETRY = RetryPolicy(retries=QUOTA_RETRIES, base_delay=0, max_delay=0)
+TRANSIENT_RETRY = RetryPolicy(retries=TRANSIENT_RETRIES, base_delay=0.25, max_delay=4)
+
+_client = None
+_services = {}
+_lock = threading.RLock()
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="google-ads")
+_stats_lock = threading.Lock()
+_queued = 0
+_in_flight = 0
+
+# Paces RPCs against the developer-token quota (global bucket) and each
+# customer's budget (per-key buckets).
+scheduler = RateLimitScheduler(
+    rate=RATE_LIMIT, burst=RATE_BURST,
+    key_rate=CUSTOMER_RATE_LIMIT, key_burst=CUSTOMER_RATE_BURST,
+    max_wait=MAX_QUEUE_WAIT,
+)
+watch_stats("google_ads_scheduler", scheduler.stats, counters=("admitted", "timed_out"))
+
+
+class LocalGoogleAdsClient(GoogleAdsClient):
+    """A GoogleAdsClient for a local stand-in server: no credentials, no TLS.
+
+    Failures still pass through the library's exception interceptor, so
+    they surface as the same exception types as live calls.
+    """
+
+    def __init__(self, address: str):
+        super().__init__(credentials=AnonymousCredentials(), developer_token="local", endpoint=address,
+                         version="v16", use_proto_plus=True)
+
+    def get_service(self, name, version=None, interceptors=None):
+        service_client_class = getattr(self._get_api_services_by_version(self.version), f"{name}Client")
+        channel = grpc.intercept_channel(
+            grpc.insecure_channel(self.endpoint),
+            ExceptionInterceptor(self.version, use_proto_plus=self.use_proto_plus),
+        )
+        transport = service_client_class.get_transport_class()(channel=channel)
+        return service_client_class(transport=transport)
+
+
+def get_client() -> GoogleAdsClient:
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                if GOOGLE_ADS_BACKEND == "fake":
+                    _client = LocalGoogleAdsClient(GOOGLE_ADS_FAKE_ADDRESS)
+                else:
+                    _client = GoogleAdsClient.load_from_storage()
+    return _client
+
+
+def get_service(name: str):
+    """Return a cached service client so its gRPC channel is reused across plans."""
+    service = _services.get(name)
+    if service is None:
+        with _lock:
+            service = _services.get(name)
+            if service is None:
+                service = get_client().get_service(name)
+                _services[name] = service
+    return service
+
+
+def refresh_credentials(force: bool = False):
+    if GOOGLE_ADS_BACKEND == "fake":
+        return
+    credentials = get_client().credentials
+    expiry = credentials.expiry
+    expiring = expiry is not None and expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN
+    if force or not credentials.valid or expiring:
+        with _lock:
+            credentials.refresh(Request())
+
+
+def _warm_up():
+    refresh_credentials(force=True)
+    service = get_service("KeywordPlanIdeaService")
+    try:
+        grpc.channel_ready_future(service.transport.grpc_channel).result(timeout=CHANNEL_READY_TIMEOUT)
+    except grpc.FutureTimeoutError:
+        print("⚠️  Google Ads channel not ready after warm-up; it will connect on first use.")
+
+
+async def warm_up():
+    try:
+        await asyncio.to_thread(_warm_up)
+        print("✅ Google Ads client warmed up")
+    except Exception as e:
+        print(f"⚠️  Google Ads warm-up failed: {e}")
+
+
+async def keep_credentials_fresh():
+    while True:
+        await asyncio.sleep(TOKEN_REFRESH_INTERVAL)
+        try:
+            await asyncio.to_thread(refresh_credentials)
+        except Exception as e:
+            print(f"⚠️  Google Ads token refresh failed: {e}")
+
+
+def _run_tracked(func, args):
+    global _queued, _in_flight
+    with _stats_lock:
+        _queued -= 1
+        _in_flight += 1
+    try:
+        return func(*args)
+    finally:
+        with _stats_lock:
+            _in_flight -= 1
+
+
+def _forget_if_cancelled(future):
+    global _queued
+    if future.cancelled():
+        with _stats_lock:
+            _queued -= 1
+
+
+async def run_blocking(func, *args):
+    """Run a blocking Google Ads call on the bounded executor."""
+    global _queued
+    with _stats_lock:
+        _queued += 1
+    future = _executor.submit(_run_tracked, func, args)
+    future.add_done_callback(_forget_if_cancelled)
+    return await asyncio.wrap_future(future)
+
+
+def executor_stats() -> dict:
+    with _stats_lock:
+        return {"max_workers": MAX_WORKERS, "queued": _queued, "in_flight": _in_flight}
+
+
+watch_stats("google_ads_executor", executor_stats)
+
+
+def _generate_keyword_ideas(request, consume, timeout):
+    response = get_service("KeywordPlanIdeaService").generate_keyword_ideas(request=request, timeout=timeout)
+    return consume(response.results)
+
+
+def _google_ads_failure(error: Exception) -> Optional[GoogleAdsFailure]:
+    """The GoogleAdsFailure attached to an error, if any.
+
+    The library's exception interceptor leaves RESOURCE_EXHAUSTED as a plain
+    gRPC error, so quota details have to be read from its trailers.
+    """
+    if isinstance(error, GoogleAdsException):
+        return error.failure
+    call = error.response if isinstance(error, GoogleAPICallError) else error
+    trailing_metadata = getattr(call, "trailing_metadata", None)
+    if not callable(trailing_metadata):
+        return None
+    for key, value in trailing_metadata() or ():
+        if key == FAILURE_METADATA_KEY:
+            return GoogleAdsFailure.deserialize(value)
+    return None
+
+
+def _quota_backoff(error: Exception, customer_id: str) -> Optional[tuple]:
+    """Return ``(scope_key, delay)`` for a quota failure, or None for other errors.
+
+    ``scope_key`` is None when the developer-token quota is exhausted, so the
+    whole scheduler backs off rather than only the customer.
+    """
+    exhausted = _status_code(error) == grpc.StatusCode.RESOURCE_EXHAUSTED
+    delay, scope_key = 0.0, customer_id
+    failure = _google_ads_failure(error)
+    for failure_error in failure.errors if failure is not None else ():
+        if failure_error.error_code.quota_error.name not in ("RESOURCE_EXHAUSTED", "RESOURCE_TEMPORARILY_EXHAUSTED"):
+            continue
+        exhausted = True
+        details = failure_error.details.quota_error_details
+        # proto-plus hands Durations over as datetime.timedelta.
+        delay = max(delay, details.retry_delay.total_seconds())
+        if details.rate_scope.name == "DEVELOPER":
+            scope_key = None
+    if exhausted:
+        return scope_key, delay or QUOTA_DEFAULT_RETRY_DELAY
+    return None
+
+
+def _status_code(error: Exception):
+    if isinstance(error, GoogleAdsException):
+        return error.error.code()
+    if isinstance(error, grpc.RpcError):
+        return error.code()
+    # Failures without a GoogleAdsFailure reach us wrapped by google.api_core.
+    if isinstance(error, GoogleAPICallError):
+        return error.grpc_status_code
+    return None
+
+
+async def generate_keyword_ideas(request, consume=list):
+    """Call KeywordPlanIdeaService.GenerateKeywordIdeas off the event loop.
+
+    Each attempt is admitted by the quota scheduler first. On
+    RESOURCE_EXHAUSTED the scheduler is paused for the retry delay the API
+    asks for and the call is queued again. UNAVAILABLE, DEADLINE_EXCEEDED and
+    INTERNAL failures are retried with jittered backoff.
+
+    Later result pages are fetched lazily while iterating, so ``consume`` runs
+    on the executor thread as well and receives the result iterator.
+    """
+    customer_id = request.customer_id
+
+    async def attempt():
+        with observe_queue_wait("google_ads"):
+            await scheduler.acquire(customer_id, timeout=bounded(MAX_QUEUE_WAIT))
+        try:
+            with observe_upstream("google_ads", "generate_keyword_ideas"), \
+                    tracing.span("google_ads.generate_keyword_ideas", customer_id=customer_id) as current:
+                result = await run_blocking(_generate_keyword_ideas, request, consume, bounded(CALL_TIMEOUT))
+                if hasattr(result, "__len__"):
+                    current.set_attribute("results", len(result))
+                return result
+        except (GoogleAdsException, grpc.RpcError, GoogleAPICallError) as e:
+            backoff = _quota_backoff(e, customer_id)
+            if backoff is not None:
+                scope_key, delay = backoff
+                print(f"⚠️  Google Ads quota exhausted ({scope_key or 'developer token'}); blocked for {delay:.1f}s")
+                scheduler.block(scope_key, delay)
+            raise
+
+    def classify(error: Exception):
+        if _quota_backoff(error, customer_id) is not None:
+            return QUOTA_RETRY
+        if _status_code(error) in TRANSIENT_CODES:
+            return TRANSIENT_RETRY
+        return None
+
+    return await call_with_retries(attempt, classify, "Google Ads GenerateKeywordIdeas")
+
+
+def shutdown_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -1,6 +1,13 @@
+import json
+import math
+import asyncio
 from fastapi import APIRouter, HTTPException
-from models import PlanRequest, PlanResponse
+from fastapi.responses import StreamingResponse
+from models import PlanRequest, PlanResponse, PlanJob, BatchPlanRequest, BatchPlanResponse
 from sem_plan import generate_full_sem_plan
+from jobs import plan_jobs, JobQueueFull
+from batch import generate_batch_sem_plans, PLAN_BATCH_MAX_ITEMS
+from llm_calls import LLMBudgetExhausted
 
 router = APIRouter()
 
@@ -9,6 +16,70 @@ async def create_sem_plan(request: PlanRequest):
     try:
         plan = await generate_full_sem_plan(request)
         return plan
+    except LLMBudgetExhausted as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/plan/batch", response_model=BatchPlanResponse, summary="Generate SEM Plans for several brands")
+async def create_sem_plan_batch(request: BatchPlanRequest):
+    if len(request.plans) > PLAN_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413, detail=f"Batch has {len(request.plans)} plans; the limit is {PLAN_BATCH_MAX_ITEMS}"
+        )
+    return await generate_batch_sem_plans(request.plans)
+
+def _sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _stream_plan_events(request: PlanRequest):
+    queue = asyncio.Queue()
+    task = asyncio.create_task(generate_full_sem_plan(
+        request, on_deliverable=lambda name, value: queue.put_nowait((name, value))
+    ))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            name, value = item
+            yield _sse_event(name, value.model_dump(mode="json"))
+
+        plan = task.result()
+        if plan is None:
+            raise RuntimeError("Plan generation returned no result")
+        yield _sse_event("complete", plan.model_dump(mode="json"))
+    except Exception as e:
+        yield _sse_event("error", {"detail": str(e)})
+    finally:
+        task.cancel()
+
+@router.post("/plan/stream", summary="Stream an SEM Plan as Server-Sent Events")
+async def stream_sem_plan(request: PlanRequest):
+    return StreamingResponse(
+        _stream_plan_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/plan/jobs", response_model=PlanJob, status_code=202, summary="Queue an SEM Plan job")
+async def submit_sem_plan_job(request: PlanRequest):
+    try:
+        return plan_jobs.submit(request)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.get("/plan/jobs/{job_id}", response_model=PlanJob, summary="Get the status or result of an SEM Plan job")
+async def get_sem_plan_job(job_id: str):
+    job = plan_jobs.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@router.delete("/plan/jobs/{job_id}", response_model=PlanJob, summary="Cancel an SEM Plan job")
+async def cancel_sem_plan_job(job_id: str):
+    job = plan_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
@@ -0,0 +1,53 @@
+import os
+import asyncio
+from typing import List
+from models import PlanRequest, BatchPlanItem, BatchPlanResponse
+from sem_plan import generate_full_sem_plan
+from cache import make_key
+from rate_limit import Priority, request_priority
+
+PLAN_BATCH_MAX_ITEMS = int(os.getenv("PLAN_BATCH_MAX_ITEMS", "100"))
+PLAN_BATCH_CONCURRENCY = int(os.getenv("PLAN_BATCH_CONCURRENCY", "10"))
+
+# Shared by every batch in the process, so concurrent batches cannot
+# multiply the number of plans in flight.
+_plan_slots = asyncio.Semaphore(PLAN_BATCH_CONCURRENCY)
+
+
+async def _run_plan(request: PlanRequest):
+    # Batch plans queue behind interactive ones for upstream quota.
+    request_priority.set(Priority.batch)
+    async with _plan_slots:
+        return await generate_full_sem_plan(request)
+
+
+async def generate_batch_sem_plans(requests: List[PlanRequest]) -> BatchPlanResponse:
+    """Plan every request in the batch and report a result or error per item.
+
+    Identical requests are planned once. Shared upstream work across
+    different requests (page fetches, keyword idea lookups and completions)
+    is collapsed by the caches and in-flight de-duplication in those
+    modules, while the Google Ads executor and the Groq semaphore bound the
+    total upstream concurrency.
+    """
+    unique = {}
+    for index, request in enumerate(requests):
+        unique.setdefault(make_key(request.model_dump()), []).append(index)
+
+    keys = list(unique)
+    outcomes = await asyncio.gather(
+        *(_run_plan(requests[unique[key][0]]) for key in keys), return_exceptions=True
+    )
+
+    items = [None] * len(requests)
+    for key, outcome in zip(keys, outcomes):
+        for index in unique[key]:
+            if isinstance(outcome, BaseException):
+                items[index] = BatchPlanItem(index=index, error=str(outcome) or type(outcome).__name__)
+            elif outcome is None:
+                items[index] = BatchPlanItem(index=index, error="Plan generation returned no result")
+            else:
+                items[index] = BatchPlanItem(index=index, result=outcome)
+
+    failed = sum(item.error is not None for item in items)
+    return BatchPlanResponse(results=items, succeeded=len(items) - failed, failed=failed)
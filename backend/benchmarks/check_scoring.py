@@ -0,0 +1,88 @@
+"""Check scoring.rank_ideas against the per-dict scoring loop it replaced.
+
+Run from the backend directory:
+
+    python -m benchmarks.check_scoring
+    python -m benchmarks.check_scoring --cases 5000 --seed 7
+
+Each case draws a random idea set, at times with few distinct values or a
+constant column so scores tie at the cut-off, and requires both scorers to
+select the same keywords in the same order. Exits non-zero on a mismatch.
+"""
+import sys
+import random
+import argparse
+from typing import Dict, List
+from keyword_ideas import KeywordIdeas
+from scoring import rank_ideas
+
+
+def scalar_rank(keywords: List[Dict], k: int) -> List[Dict]:
+    """The scoring loop from sem_plan.py before it moved to scoring.py."""
+    if not keywords:
+        return []
+    volumes = [kw['avg_monthly_searches'] for kw in keywords]
+    bids = [((kw['low_top_of_page_bid'] + kw['high_top_of_page_bid']) / 2) for kw in keywords]
+    competitions = [kw['competition_index'] for kw in keywords]
+
+    min_vol, max_vol = min(volumes), max(volumes)
+    min_bid, max_bid = min(bids), max(bids)
+    min_comp, max_comp = min(competitions), max(competitions)
+
+    def normalize(val, min_val, max_val):
+        return (val - min_val) / (max_val - min_val) if max_val > min_val else 0.0
+
+    w1, w2, w3 = 0.4, 0.4, 0.2
+
+    for kw in keywords:
+        norm_vol = normalize(kw['avg_monthly_searches'], min_vol, max_vol)
+        avg_bid = (kw['low_top_of_page_bid'] + kw['high_top_of_page_bid']) / 2
+        norm_bid = normalize(avg_bid, min_bid, max_bid)
+        norm_comp = normalize(kw['competition_index'], min_comp, max_comp)
+        kw['roas_score'] = (w1 * norm_vol) + (w2 * norm_bid) - (w3 * norm_comp)
+
+    return sorted(keywords, key=lambda x: x['roas_score'], reverse=True)[:k]
+
+
+def random_keywords(rng: random.Random) -> List[Dict]:
+    n = rng.choice([0, 1, 2, rng.randint(3, 60), rng.randint(60, 3000)])
+    # Few distinct values make many exact score ties.
+    distinct = rng.choice([1, 2, 5, 1000])
+    volumes = [rng.choice([10, 50, 100, 1000, 5000, 100000]) * rng.randint(1, 20) for _ in range(distinct)]
+    bids = [round(rng.uniform(0.05, 20), 2) for _ in range(distinct)]
+    competitions = [float(rng.randint(0, 100)) for _ in range(distinct)]
+    keywords = []
+    for i in range(n):
+        low = rng.choice(bids)
+        keywords.append({
+            "text": f"keyword {i}",
+            "avg_monthly_searches": rng.choice(volumes),
+            "competition_level": "UNSPECIFIED",
+            "competition_index": rng.choice(competitions),
+            "low_top_of_page_bid": low,
+            "high_top_of_page_bid": low * rng.choice([1.0, 1.5, 2.0, 3.0]),
+        })
+    return keywords
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for case in range(args.cases):
+        keywords = random_keywords(rng)
+        k = rng.choice([1, 25, 50, len(keywords) + 1])
+        expected = [kw["text"] for kw in scalar_rank([dict(kw) for kw in keywords], k)]
+        actual = rank_ideas(KeywordIdeas.from_records(keywords), k).text
+        if actual != expected:
+            print(f"❌ Case {case}: {len(keywords)} keywords, k={k}: rank_ideas differs from the scalar loop")
+            print(f"   expected {expected[:10]}...\n   got      {actual[:10]}...")
+            sys.exit(1)
+    print(f"✅ rank_ideas matched the scalar loop on {args.cases} cases")
+
+
+if __name__ == "__main__":
+    main()
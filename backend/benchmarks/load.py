@@ -0,0 +1,301 @@
+"""Load generator for POST /api/v1/plan against a running backend.
+
+Start the upstream stand-ins and one uvicorn worker pointed at them:
+
+    python -m fakes
+    GOOGLE_ADS_BACKEND=fake GOOGLE_ADS_CUSTOMER_ID=1234567890 GROQ_BASE_URL=http://localhost:8090 \\
+        uvicorn main:app --port 8000
+
+then, from the backend directory:
+
+    python -m benchmarks.load --serve-pages --mode closed --concurrency 1,2,4,8,16,32 --duration 30
+    python -m benchmarks.load --serve-pages --mode open --rate 0.5,1,2,4 --duration 60 --cache warm
+
+Closed loop keeps ``--concurrency`` requests in flight; open loop sends
+Poisson arrivals at ``--rate`` requests/s whatever the response times are.
+A comma-separated list sweeps the levels in order. ``--cache cold`` gives
+every request URLs the backend has not seen; ``--cache warm`` reuses the mix
+and primes it before measuring. ``--serve-pages`` serves the recorded
+landing page locally and rewrites brand URLs to it, so no request leaves the
+machine. Each level reports throughput, latency percentiles, error rates and
+the mock fallbacks and upstream errors counted in the backend's /metrics.
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+import aiohttp
+from prometheus_client.parser import text_string_to_metric_families
+from fakes.common import FIXTURES_DIR, Latency
+from fakes.pages import LandingPageServer
+from benchmarks.run import summarize
+
+PLAN_PATH = "/api/v1/plan"
+
+# Budgets are drawn uniformly from [low, high] ranges.
+DEFAULT_MIX = [
+    {"brand_url": "https://www.allbirds.com", "competitor_url": "https://www.nike.com",
+     "service_locations": "New York, San Francisco", "search_ads_budget": [500, 5000],
+     "shopping_ads_budget": [500, 5000], "pmax_ads_budget": [500, 5000],
+     "average_product_price": [60, 140], "target_roas_percentage": [300, 600]},
+    {"brand_url": "https://www.warbyparker.com", "competitor_url": "https://www.zennioptical.com",
+     "service_locations": "Chicago", "search_ads_budget": [1000, 8000],
+     "shopping_ads_budget": [500, 3000], "pmax_ads_budget": [1000, 6000],
+     "average_product_price": [95, 250], "target_roas_percentage": [250, 500]},
+    {"brand_url": "https://www.glossier.com", "competitor_url": "https://www.fentybeauty.com",
+     "service_locations": "Los Angeles, Miami", "search_ads_budget": [300, 3000],
+     "shopping_ads_budget": [300, 4000], "pmax_ads_budget": [300, 4000],
+     "average_product_price": [15, 60], "target_roas_percentage": [400, 800]},
+    {"brand_url": "https://www.casper.com", "competitor_url": "https://www.purple.com",
+     "service_locations": "Austin, Denver", "search_ads_budget": [2000, 10000],
+     "shopping_ads_budget": [1000, 6000], "pmax_ads_budget": [2000, 10000],
+     "average_product_price": [500, 1500], "target_roas_percentage": [200, 400]},
+    {"brand_url": "https://www.bombas.com", "competitor_url": "https://www.stance.com",
+     "service_locations": "Boston", "search_ads_budget": [200, 2000],
+     "shopping_ads_budget": [200, 2000], "pmax_ads_budget": [200, 2000],
+     "average_product_price": [12, 40], "target_roas_percentage": [300, 700]},
+]
+
+
+def _sample(value, rng: random.Random):
+    if isinstance(value, list):
+        low, high = value
+        return rng.randint(low, high) if isinstance(low, int) and isinstance(high, int) else rng.uniform(low, high)
+    return value
+
+
+class RequestMix:
+    """Builds plan request bodies from mix entries, with fresh URLs when the cache should be cold."""
+
+    def __init__(self, entries: List[Dict], cold: bool, page_base_url: Optional[str] = None, seed: int = 0):
+        self.entries = entries
+        self.cold = cold
+        self.page_base_url = page_base_url
+        self.rng = random.Random(seed)
+        self._sent = 0
+
+    def _brand_url(self, url: str) -> str:
+        """Point the brand URL at the local page server, keeping the site it stands for.
+
+        https://www.allbirds.com/shoes becomes <page server>/www.allbirds.com/shoes;
+        the upstream fakes read the brand from that first path segment
+        (fakes.common.brand_name), so each mix entry keeps its own keywords.
+        """
+        if self.page_base_url is None:
+            return url
+        parsed = urlparse(url)
+        return f"{self.page_base_url}/{parsed.hostname or 'brand'}{parsed.path.rstrip('/')}"
+
+    def body(self, entry: Dict) -> Dict:
+        body = {key: _sample(value, self.rng) for key, value in entry.items()}
+        body["brand_url"] = self._brand_url(body["brand_url"])
+        if self.cold:
+            # New URLs miss the page, keyword idea and completion caches.
+            self._sent += 1
+            body["brand_url"] = f"{body['brand_url'].rstrip('/')}/load-{self._sent}"
+            body["competitor_url"] = f"{body['competitor_url'].rstrip('/')}/load-{self._sent}"
+        return body
+
+    def next(self) -> Dict:
+        return self.body(self.rng.choice(self.entries))
+
+    def warm_up_bodies(self) -> List[Dict]:
+        return [self.body(entry) for entry in self.entries]
+
+
+class LevelResult:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.sent = 0
+        self.dropped = 0
+
+    def record(self, latency: float, error: Optional[str]):
+        if error is None:
+            self.latencies.append(latency)
+        else:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+
+async def send_plan(session: aiohttp.ClientSession, url: str, body: Dict, result: LevelResult):
+    result.sent += 1
+    start = time.perf_counter()
+    error = None
+    try:
+        async with session.post(url, json=body) as response:
+            await response.read()
+            if response.status != 200:
+                error = f"http_{response.status}"
+    except asyncio.TimeoutError:
+        error = "timeout"
+    except aiohttp.ClientError as e:
+        error = type(e).__name__
+    result.record(time.perf_counter() - start, error)
+
+
+async def closed_loop(session, url: str, mix: RequestMix, concurrency: int, duration: float) -> LevelResult:
+    result = LevelResult()
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        while time.perf_counter() < deadline:
+            await send_plan(session, url, mix.next(), result)
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return result
+
+
+async def open_loop(session, url: str, mix: RequestMix, rate: float, duration: float,
+                    max_in_flight: int, rng: random.Random) -> LevelResult:
+    result = LevelResult()
+    in_flight = set()
+    start = time.perf_counter()
+    next_arrival = start
+    while next_arrival < start + duration:
+        await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+        if len(in_flight) >= max_in_flight:
+            result.dropped += 1
+        else:
+            task = asyncio.create_task(send_plan(session, url, mix.next(), result))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        next_arrival += rng.expovariate(rate)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    return result
+
+
+async def scrape_counters(session: aiohttp.ClientSession, base_url: str) -> Dict[str, float]:
+    """Mock fallbacks and upstream errors so far, from the backend's /metrics."""
+    try:
+        async with session.get(f"{base_url}/metrics") as response:
+            text = await response.text()
+    except aiohttp.ClientError:
+        return {}
+    counters = {}
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name == "sem_plan_mock_fallbacks_total":
+                counters["mock_fallbacks"] = counters.get("mock_fallbacks", 0) + sample.value
+            elif sample.name == "sem_upstream_errors_total":
+                key = f"{sample.labels['upstream']}_errors"
+                counters[key] = counters.get(key, 0) + sample.value
+    return counters
+
+
+def level_report(result: LevelResult, elapsed: float) -> Dict:
+    completed = len(result.latencies) + sum(result.errors.values())
+    return {
+        "sent": result.sent,
+        "dropped": result.dropped,
+        "succeeded": len(result.latencies),
+        "error_rate": sum(result.errors.values()) / completed if completed else 0.0,
+        "errors": result.errors,
+        "throughput_plans_per_s": len(result.latencies) / elapsed,
+        "latency": summarize(result.latencies),
+    }
+
+
+async def run_level(args, session, mix: RequestMix, level: float, rng: random.Random) -> Dict:
+    url = f"{args.url}{PLAN_PATH}"
+    if not mix.cold:
+        await asyncio.gather(*(send_plan(session, url, body, LevelResult()) for body in mix.warm_up_bodies()))
+    before = await scrape_counters(session, args.url)
+    start = time.perf_counter()
+    if args.mode == "closed":
+        result = await closed_loop(session, url, mix, int(level), args.duration)
+    else:
+        result = await open_loop(session, url, mix, level, args.duration, args.max_in_flight, rng)
+    report = level_report(result, time.perf_counter() - start)
+    after = await scrape_counters(session, args.url)
+    report["backend"] = {key: after[key] - before.get(key, 0) for key in after}
+    report["concurrency" if args.mode == "closed" else "rate"] = level
+    return report
+
+
+def print_header(mode: str):
+    level_name = "concurrency" if mode == "closed" else "rate/s"
+    print(f"{level_name:>12} {'sent':>6} {'ok':>6} {'err%':>6} {'plans/s':>8} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  backend")
+
+
+def print_level(report: Dict):
+    latency = report["latency"]
+    level = report.get("concurrency", report.get("rate"))
+    if latency["count"]:
+        percentiles = " ".join(f"{latency[key]:9.0f}" for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms"))
+    else:
+        percentiles = " ".join(f"{'-':>9}" for _ in range(4))
+    backend = ", ".join(f"{key}={value:.0f}" for key, value in sorted(report["backend"].items()) if value)
+    print(f"{level:>12g} {report['sent']:>6} {report['succeeded']:>6} {report['error_rate'] * 100:>6.1f} "
+          f"{report['throughput_plans_per_s']:>8.2f} {percentiles}  {backend}")
+    if report["errors"]:
+        print(f"{'':>12} errors: " + ", ".join(f"{key}={value}" for key, value in report["errors"].items()))
+    if report["dropped"]:
+        print(f"{'':>12} dropped {report['dropped']} arrivals at the in-flight limit")
+
+
+def parse_levels(text: str) -> List[float]:
+    return [float(level) for level in text.split(",") if level.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="backend base URL")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    parser.add_argument("--concurrency", type=parse_levels, default=[1, 2, 4, 8, 16],
+                        help="closed loop: requests in flight, comma-separated to sweep")
+    parser.add_argument("--rate", type=parse_levels, default=[1.0],
+                        help="open loop: arrivals per second, comma-separated to sweep")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per level")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="open loop: drop arrivals beyond this")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds per request")
+    parser.add_argument("--cache", choices=("cold", "warm"), default="cold")
+    parser.add_argument("--mix", metavar="PATH", help="JSON list of plan requests; budgets may be [low, high]")
+    parser.add_argument("--serve-pages", action="store_true", help="serve brand pages locally from the fixtures")
+    parser.add_argument("--page-latency", type=float, default=0.15, help="seconds per locally served brand page")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    entries = DEFAULT_MIX
+    if args.mix:
+        with open(args.mix, encoding="utf-8") as f:
+            entries = json.load(f)
+
+    pages = None
+    if args.serve_pages:
+        html = (FIXTURES_DIR / "landing_page.html").read_text(encoding="utf-8")
+        pages = LandingPageServer(html, Latency(args.page_latency, rng=random.Random(args.seed)))
+        await pages.start()
+
+    rng = random.Random(args.seed)
+    levels = args.concurrency if args.mode == "closed" else args.rate
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    reports = []
+    print_header(args.mode)
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            for level in levels:
+                mix = RequestMix(entries, cold=args.cache == "cold",
+                                 page_base_url=pages.base_url if pages else None, seed=rng.randrange(2**32))
+                reports.append(await run_level(args, session, mix, level, rng))
+                print_level(reports[-1])
+    finally:
+        if pages is not None:
+            await pages.stop()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "levels": reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""Record fixtures for the benchmarks from one live plan.
+
+Needs working Google Ads and Groq credentials. Run from the backend directory:
+
+    python -m benchmarks.record --brand-url https://www.mybrand.com \\
+        --competitor-url https://www.competitor.com --out fakes/fixtures
+
+Writes keyword_ideas.json (the largest GenerateKeywordIdeas response seen),
+groq_completions.json (the last completion per operation) and
+landing_page.html (the brand page), in the formats the stand-ins in fakes/ read.
+"""
+import os
+
+# Every response must come from the live APIs, not from a cache.
+os.environ["LLM_CACHE_DISABLED"] = "1"
+os.environ["KEYWORD_CACHE_DB"] = ""
+os.environ["PAGE_CACHE_DB"] = ""
+
+import json
+import asyncio
+import argparse
+from pathlib import Path
+from types import SimpleNamespace
+from google.ads.googleads.v16.services.types.keyword_plan_idea_service import GenerateKeywordIdeaResult
+import ads_client
+import llm_calls
+from fakes.common import FIXTURES_DIR
+from fakes.groq import operation
+from http_client import get_session, close_session
+from models import PlanRequest
+from sem_plan import generate_full_sem_plan
+
+
+class Recorder:
+    def __init__(self):
+        self.keyword_ideas = []
+        self.completions = {}
+        self._generate_keyword_ideas = ads_client._generate_keyword_ideas
+        self._completions = llm_calls._scheduled_client.chat.completions
+
+    def generate_keyword_ideas(self, request, consume, timeout=None):
+        seen = []
+
+        def tee(results):
+            for result in results:
+                seen.append(GenerateKeywordIdeaResult.to_dict(result, use_integers_for_enums=False))
+                yield result
+
+        try:
+            return self._generate_keyword_ideas(request, lambda results: consume(tee(results)), timeout)
+        finally:
+            if len(seen) > len(self.keyword_ideas):
+                self.keyword_ideas = seen
+
+    async def create(self, **kwargs):
+        response = await self._completions.create(**kwargs)
+        kind = operation(kwargs["messages"][0]["content"])
+        self.completions[kind] = response.choices[0].message.content
+        return response
+
+    def install(self):
+        ads_client._generate_keyword_ideas = self.generate_keyword_ideas
+        llm_calls._scheduled_client = SimpleNamespace(chat=SimpleNamespace(completions=self))
+
+    def write(self, out: Path, landing_page: str):
+        out.mkdir(parents=True, exist_ok=True)
+        with open(out / "keyword_ideas.json", "w", encoding="utf-8") as f:
+            json.dump({"results": self.keyword_ideas}, f, indent=1)
+        with open(out / "groq_completions.json", "w", encoding="utf-8") as f:
+            json.dump(self.completions, f, indent=1)
+        (out / "landing_page.html").write_text(landing_page, encoding="utf-8")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--brand-url", required=True)
+    parser.add_argument("--competitor-url", required=True)
+    parser.add_argument("--out", type=Path, default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    recorder = Recorder()
+    recorder.install()
+    try:
+        await generate_full_sem_plan(PlanRequest(
+            brand_url=args.brand_url,
+            competitor_url=args.competitor_url,
+            service_locations="New York",
+            search_ads_budget=1000.0,
+            shopping_ads_budget=1000.0,
+            pmax_ads_budget=1000.0,
+            average_product_price=50.0,
+            target_roas_percentage=400,
+        ))
+        if "seed_keywords" not in recorder.completions:
+            # Only thin brand pages ask the LLM for seeds during a plan.
+            await llm_calls.generate_seed_keywords(args.brand_url)
+        async with get_session().get(args.brand_url) as response:
+            landing_page = await response.text()
+    finally:
+        await close_session()
+
+    missing = {"seed_keywords", "cluster_keywords", "pmax_themes"} - set(recorder.completions)
+    if not recorder.keyword_ideas or missing:
+        print(f"⚠️  Incomplete recording (keyword ideas: {len(recorder.keyword_ideas)}, "
+              f"missing completions: {sorted(missing)}); fixtures not written.")
+        return
+    recorder.write(args.out, landing_page)
+    print(f"✅ Recorded {len(recorder.keyword_ideas)} keyword ideas and {len(recorder.completions)} completions to {args.out}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""Install the upstream stand-ins from fakes/ in-process, in place of Google Ads, Groq and brand pages.
+
+The fakes are installed at the same seams the live clients use, so the code
+under test (scheduling, seed chunking, paging, parsing, scoring and caching)
+runs unchanged and only the network is replaced. They are the same fakes
+`python -m fakes` serves to load tests, so both see the same upstream.
+"""
+import os
+
+# The benchmarks measure the pipeline rather than the account quotas, so the
+# rate limiters are opened up unless the caller configured them explicitly.
+for _name, _value in {
+    "GOOGLE_ADS_CUSTOMER_ID": "1234567890",
+    "GOOGLE_ADS_RATE_LIMIT": "1000000",
+    "GOOGLE_ADS_RATE_BURST": "1000000",
+    "GOOGLE_ADS_CUSTOMER_RATE_LIMIT": "1000000",
+    "GOOGLE_ADS_CUSTOMER_RATE_BURST": "1000000",
+    "GROQ_RPM": "1000000000",
+    "GROQ_TPM": "1000000000",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import random
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, Optional
+from google.ads.googleads.v16.services.types.keyword_plan_idea_service import GenerateKeywordIdeasRequest
+from fakes.common import FIXTURES_DIR, Latency
+from fakes.google_ads import FakeKeywordPlanIdeaService, IdeaGenerator, load_recorded_metrics
+from fakes.groq import CompletionWriter, FakeGroqCompletions, load_recorded_completions
+from fakes.pages import LandingPageServer
+import ads_client
+import keywords
+import llm_calls
+import url_checker
+
+
+class _FakeGoogleAdsClient:
+    def get_type(self, name: str):
+        if name != "GenerateKeywordIdeasRequest":
+            raise ValueError(f"Replay has no fixture type for {name}")
+        return GenerateKeywordIdeasRequest()
+
+
+class Replay:
+    """Installs the fakes into the live modules and restores them afterwards."""
+
+    def __init__(self, ads: FakeKeywordPlanIdeaService, groq: FakeGroqCompletions, pages: LandingPageServer):
+        self.ads = ads
+        self.groq = groq
+        self.pages = pages
+        self._saved = []
+
+    def _patch(self, module, name, value):
+        self._saved.append((module, name, getattr(module, name)))
+        setattr(module, name, value)
+
+    def install(self):
+        self._patch(ads_client, "_generate_keyword_ideas", self.ads)
+        self._patch(keywords, "get_client", _FakeGoogleAdsClient)
+        self._patch(llm_calls, "_scheduled_client", SimpleNamespace(chat=SimpleNamespace(completions=self.groq)))
+
+    def restore(self):
+        while self._saved:
+            module, name, value = self._saved.pop()
+            setattr(module, name, value)
+
+    def counters(self) -> Dict[str, int]:
+        return {
+            "ads_rpcs": self.ads.rpcs,
+            "ads_pages": self.ads.pages,
+            "ads_ideas_served": self.ads.ideas_served,
+            "groq_calls": self.groq.calls,
+            "page_requests": self.pages.requests,
+            "page_not_modified": self.pages.not_modified,
+        }
+
+
+def build_replay(ads_latency: float, groq_latency: float, page_latency: float, ideas: Optional[int] = None,
+                 ads_page_latency: Optional[float] = None, fixtures_dir: Path = FIXTURES_DIR,
+                 seed: int = 0) -> Replay:
+    """The fakes from fakes/, in-process, fed from the recorded fixtures.
+
+    ``ideas`` is the number of keyword ideas per seed set; by default as many
+    as the recorded response held.
+    """
+    rng = random.Random(seed)
+    metrics = load_recorded_metrics(fixtures_dir / "keyword_ideas.json")
+    page_gap = ads_latency / 4 if ads_page_latency is None else ads_page_latency
+    ads = FakeKeywordPlanIdeaService(
+        IdeaGenerator(metrics, ideas or len(metrics)), Latency(ads_latency, rng=rng), Latency(page_gap, rng=rng),
+        seed=seed,
+    )
+    writer = CompletionWriter(load_recorded_completions(fixtures_dir / "groq_completions.json"))
+    groq = FakeGroqCompletions(writer, Latency(groq_latency, rng=rng), seed=seed)
+    html = (fixtures_dir / "landing_page.html").read_text(encoding="utf-8")
+    return Replay(ads, groq, LandingPageServer(html, Latency(page_latency, rng=rng)))
+
+
+def clear_caches():
+    keywords.keyword_idea_cache.clear()
+    llm_calls.completion_cache.clear()
+    url_checker.page_cache.clear()
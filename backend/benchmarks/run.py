@@ -0,0 +1,229 @@
+"""Offline benchmarks for the plan pipeline, replaying recorded upstream fixtures.
+
+Run from the backend directory:
+
+    python -m benchmarks.run                                  # every scenario
+    python -m benchmarks.run single --iterations 50
+    python -m benchmarks.run concurrent --plans 200 --concurrency 20
+    python -m benchmarks.run large_ideas --ideas 12000
+    python -m benchmarks.run --warm --json results.json
+
+Latency is injected per upstream (--ads-latency, --groq-latency,
+--page-latency, in seconds). Caches are cleared before every plan unless
+--warm is given. Each scenario reports latency percentiles, per-stage and
+per-upstream timings from the trace spans, upstream call counts, and the
+peak memory and top allocation sites of one extra traced plan.
+"""
+import io
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import Dict, List
+import numpy as np
+from benchmarks.replay import build_replay, clear_caches
+from models import PlanRequest
+from sem_plan import generate_full_sem_plan
+from http_client import close_session
+import tracing
+
+SCENARIOS = ("single", "concurrent", "large_ideas")
+UPSTREAM_SPANS = ("url.fetch", "google_ads.generate_keyword_ideas", "groq.chat_completion")
+
+
+def summarize(seconds: List[float]) -> Dict[str, float]:
+    if not seconds:
+        return {"count": 0}
+    ms = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": len(ms),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+    }
+
+
+def make_request(base_url: str, index: int) -> PlanRequest:
+    # Distinct URLs per plan so in-flight de-duplication does not hide work.
+    return PlanRequest(
+        brand_url=f"{base_url}/brand/{index}",
+        competitor_url=f"https://competitor-{index}.example.com",
+        service_locations="New York, San Francisco",
+        search_ads_budget=1000.0,
+        shopping_ads_budget=1500.0,
+        pmax_ads_budget=2000.0,
+        average_product_price=75.0,
+        target_roas_percentage=400,
+    )
+
+
+class Scenario:
+    def __init__(self, args, replay, base_url: str):
+        self.args = args
+        self.replay = replay
+        self.base_url = base_url
+        self.spans = tracing.InMemoryExporter()
+        self._next_index = 0
+
+    def next_request(self) -> PlanRequest:
+        self._next_index += 1
+        return make_request(self.base_url, self._next_index)
+
+    async def timed_plan(self) -> float:
+        if not self.args.warm:
+            clear_caches()
+        request = self.next_request()
+        start = time.perf_counter()
+        await generate_full_sem_plan(request)
+        return time.perf_counter() - start
+
+    async def measure_allocations(self) -> Dict:
+        tracemalloc.start(25)
+        try:
+            await self.timed_plan()
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        top = snapshot.statistics("lineno")[:self.args.top_allocations]
+        return {
+            "peak_kib": peak / 1024,
+            "retained_kib": current / 1024,
+            "top_sites": [
+                {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "kib": stat.size / 1024, "blocks": stat.count}
+                for stat in top
+            ],
+        }
+
+    def span_summary(self) -> Dict:
+        durations = {}
+        mock_fallbacks = 0
+        for span in self.spans.spans:
+            if span.name.startswith("stage.") or span.name in UPSTREAM_SPANS:
+                durations.setdefault(span.name, []).append(span.duration)
+            if span.name == "plan" and span.attributes.get("mock_fallback"):
+                mock_fallbacks += 1
+        return {
+            "spans": {name: summarize(values) for name, values in sorted(durations.items())},
+            "mock_fallbacks": mock_fallbacks,
+        }
+
+    async def run(self, name: str) -> Dict:
+        await self.timed_plan()  # warm-up: imports, connection pool, executor threads
+        before = self.replay.counters()
+        tracing.add_exporter(self.spans)
+        try:
+            result = await getattr(self, f"run_{name}")()
+        finally:
+            tracing.remove_exporter(self.spans)
+        after = self.replay.counters()
+        result["upstream_calls"] = {key: after[key] - before[key] for key in after}
+        result.update(self.span_summary())
+        result["allocations"] = await self.measure_allocations()
+        return result
+
+    async def run_single(self) -> Dict:
+        latencies = [await self.timed_plan() for _ in range(self.args.iterations)]
+        return {"latency": summarize(latencies)}
+
+    async def run_concurrent(self) -> Dict:
+        slots = asyncio.Semaphore(self.args.concurrency)
+
+        async def bounded_plan():
+            async with slots:
+                return await self.timed_plan()
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(bounded_plan() for _ in range(self.args.plans)))
+        elapsed = time.perf_counter() - start
+        return {
+            "latency": summarize(list(latencies)),
+            "concurrency": self.args.concurrency,
+            "throughput_plans_per_s": len(latencies) / elapsed,
+        }
+
+    async def run_large_ideas(self) -> Dict:
+        latencies = [await self.timed_plan() for _ in range(self.args.iterations)]
+        return {"latency": summarize(latencies), "ideas_available": self.args.ideas}
+
+
+async def run_scenario(args, name: str) -> Dict:
+    ideas = args.ideas if name == "large_ideas" else None
+    replay = build_replay(args.ads_latency, args.groq_latency, args.page_latency, ideas=ideas, seed=args.seed)
+    base_url = await replay.pages.start()
+    replay.install()
+    try:
+        return await Scenario(args, replay, base_url).run(name)
+    finally:
+        replay.restore()
+        await replay.pages.stop()
+
+
+def print_report(results: Dict[str, Dict]):
+    for name, result in results.items():
+        latency = result["latency"]
+        print(f"\n== {name} ==")
+        print(f"plans: {latency['count']}  p50 {latency['p50_ms']:.1f}ms  p95 {latency['p95_ms']:.1f}ms  "
+              f"p99 {latency['p99_ms']:.1f}ms  max {latency['max_ms']:.1f}ms")
+        if "throughput_plans_per_s" in result:
+            print(f"throughput: {result['throughput_plans_per_s']:.1f} plans/s at concurrency {result['concurrency']}")
+        if result["mock_fallbacks"]:
+            print(f"WARNING: {result['mock_fallbacks']} plans fell back to mock data")
+        for span_name, stats in result["spans"].items():
+            print(f"  {span_name:<40} n={stats['count']:<5} p50 {stats['p50_ms']:8.1f}ms  p95 {stats['p95_ms']:8.1f}ms")
+        print("  upstream calls: " + ", ".join(f"{key}={value}" for key, value in result["upstream_calls"].items()))
+        allocations = result["allocations"]
+        print(f"  allocations (one plan): peak {allocations['peak_kib']:.0f} KiB, retained {allocations['retained_kib']:.0f} KiB")
+        for site in allocations["top_sites"]:
+            print(f"    {site['kib']:8.1f} KiB {site['blocks']:6d} blocks  {site['site']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS), metavar="scenario",
+                        help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--iterations", type=int, default=20, help="plans per sequential scenario")
+    parser.add_argument("--plans", type=int, default=100, help="plans in the concurrent scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="plans in flight in the concurrent scenario")
+    parser.add_argument("--ideas", type=int, default=12000, help="keyword ideas served in the large_ideas scenario")
+    parser.add_argument("--ads-latency", type=float, default=0.4, help="seconds per GenerateKeywordIdeas call")
+    parser.add_argument("--groq-latency", type=float, default=0.8, help="seconds per Groq completion")
+    parser.add_argument("--page-latency", type=float, default=0.15, help="seconds per brand page fetch")
+    parser.add_argument("--warm", action="store_true", help="keep caches between plans")
+    parser.add_argument("--seed", type=int, default=0, help="seed for latency jitter and synthetic ideas")
+    parser.add_argument("--top-allocations", type=int, default=5, help="allocation sites to report")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own log output")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    return args
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    results = {}
+    try:
+        for name in args.scenarios:
+            output = sys.stdout if args.verbose else io.StringIO()
+            with redirect_stdout(output):
+                results[name] = await run_scenario(args, name)
+    finally:
+        await close_session()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+"""Run both local stand-ins in one process for offline load tests.
+
+    python -m fakes --ads-port 50051 --groq-port 8090 --ads-latency 0.4 --groq-latency 0.3
+
+then start the backend with
+
+    GOOGLE_ADS_BACKEND=fake GOOGLE_ADS_FAKE_ADDRESS=localhost:50051 GROQ_BASE_URL=http://localhost:8090
+"""
+import asyncio
+import argparse
+from fakes import google_ads, groq
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--ads-port", type=int, default=50051)
+    parser.add_argument("--groq-port", type=int, default=8090)
+    google_ads.add_arguments(parser, prefix="ads-")
+    groq.add_arguments(parser, prefix="groq-")
+    args = parser.parse_args()
+
+    ads = google_ads.service_from_args(args, prefix="ads-")
+    server, ads_port = google_ads.start_server(ads, f"{args.host}:{args.ads_port}", args.ads_workers)
+    llm = groq.completions_from_args(args, prefix="groq-")
+    runner = await groq.start_server(llm, args.host, args.groq_port)
+    print(f"✅ Fake Google Ads on {args.host}:{ads_port}, fake Groq on http://{args.host}:{args.groq_port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        server.stop(grace=1)
+        print(f"Google Ads: {ads.stats()}; Groq: {llm.calls} calls ({llm.failures} injected failures)")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
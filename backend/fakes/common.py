@@ -0,0 +1,50 @@
+import ipaddress
+import random
+import threading
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
+
+# Recorded upstream responses (see benchmarks/record.py) the stand-ins draw on.
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+class Latency:
+    """Injected delay: ``mean`` seconds, spread uniformly by +/- ``jitter``."""
+
+    def __init__(self, mean: float, jitter: float = 0.25, rng: Optional[random.Random] = None):
+        self.mean = mean
+        self.jitter = jitter
+        self.rng = rng or random.Random(0)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        if self.mean <= 0:
+            return 0.0
+        with self._lock:
+            return self.mean * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+def _is_local(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def brand_name(url: str) -> str:
+    """The brand a URL stands for, e.g. "allbirds" for https://www.allbirds.com/shoes.
+
+    Pages served locally keep the site they stand in for as their first path
+    segment (http://127.0.0.1:8081/www.allbirds.com/...), so that is used
+    when the host is a loopback or IP address.
+    """
+    parsed = urlparse(url if "//" in url else f"//{url}")
+    host = parsed.hostname or ""
+    if _is_local(host):
+        host = next((part for part in parsed.path.split("/") if part), "")
+    name = host.removeprefix("www.").split(".")[0].replace("-", " ")
+    return name or "brand"
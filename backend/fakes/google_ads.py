@@ -0,0 +1,309 @@
+"""Stand-in for the Google Ads KeywordPlanIdeaService.
+
+One implementation serves both uses: installed in-process at the blocking
+call seam by the benchmarks (benchmarks/replay.py), and over plaintext gRPC
+for load tests:
+
+    python -m fakes.google_ads --port 50051 --latency 0.4 --unavailable-rate 0.02
+
+with the backend started with GOOGLE_ADS_BACKEND=fake and
+GOOGLE_ADS_FAKE_ADDRESS=localhost:50051. Idea texts are built from the
+request's seeds; their metrics are drawn from a recorded response
+(fixtures/keyword_ideas.json), thinning out for longer-tail ideas. The same
+seeds always produce the same ideas, and results are paged with
+``page_size``/``page_token`` like the real service.
+"""
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import grpc
+from google.api_core import exceptions as api_exceptions
+from google.ads.googleads.v16.errors.types.errors import (
+    ErrorCode,
+    ErrorDetails,
+    GoogleAdsError,
+    GoogleAdsFailure,
+    QuotaErrorDetails,
+)
+from google.ads.googleads.v16.errors.types.quota_error import QuotaErrorEnum
+from google.ads.googleads.v16.services.types.keyword_plan_idea_service import (
+    GenerateKeywordIdeaResponse,
+    GenerateKeywordIdeaResult,
+    GenerateKeywordIdeasRequest,
+)
+from fakes.common import FIXTURES_DIR, Latency, brand_name
+
+SERVICE_NAME = "google.ads.googleads.v16.services.KeywordPlanIdeaService"
+FAILURE_METADATA_KEY = "google.ads.googleads.v16.errors.googleadsfailure-bin"
+
+_PREFIXES = ["buy", "best", "cheap", "discount", "affordable", "top", "new", "custom", "luxury", "used"]
+_SUFFIXES = [
+    "online", "near me", "sale", "price", "reviews", "for men", "for women", "for kids", "store",
+    "outlet", "deals", "coupon", "free shipping", "2024", "brands", "vs", "uk", "usa", "wholesale",
+    "comparison", "alternatives", "how to choose", "size guide", "return policy", "black friday",
+]
+
+
+def _round_volume(volume: float) -> int:
+    """Round like Keyword Planner does: two significant digits, at least 10."""
+    volume = max(10, int(volume))
+    scale = 10 ** max(0, len(str(volume)) - 2)
+    return round(volume / scale) * scale
+
+
+def load_recorded_metrics(path: Path = FIXTURES_DIR / "keyword_ideas.json") -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [row["keyword_idea_metrics"] for row in json.load(f)["results"]]
+
+
+def _seeds_of(request: GenerateKeywordIdeasRequest) -> Tuple[Tuple[str, ...], str]:
+    if "keyword_and_url_seed" in request:
+        return tuple(request.keyword_and_url_seed.keywords), request.keyword_and_url_seed.url
+    if "keyword_seed" in request:
+        return tuple(request.keyword_seed.keywords), ""
+    if "url_seed" in request:
+        return (), request.url_seed.url
+    return (), ""
+
+
+def quota_failure(retry_delay: float) -> GoogleAdsFailure:
+    """A per-account RESOURCE_TEMPORARILY_EXHAUSTED failure asking for ``retry_delay`` seconds."""
+    return GoogleAdsFailure(errors=[GoogleAdsError(
+        error_code=ErrorCode(quota_error=QuotaErrorEnum.QuotaError.RESOURCE_TEMPORARILY_EXHAUSTED),
+        message="Too many requests. Retry in the time given in retry_delay (injected).",
+        details=ErrorDetails(quota_error_details=QuotaErrorDetails(
+            rate_scope=QuotaErrorDetails.QuotaRateScope.ACCOUNT,
+            rate_name="Requests per account per second",
+            retry_delay=timedelta(seconds=retry_delay),
+        )),
+    )])
+
+
+class _FailedCall:
+    """The parts of a failed grpc.Call the client reads: code, details and trailers."""
+
+    def __init__(self, code: grpc.StatusCode, details: str, trailing_metadata: tuple):
+        self._code = code
+        self._details = details
+        self._trailing_metadata = trailing_metadata
+
+    def code(self) -> grpc.StatusCode:
+        return self._code
+
+    def details(self) -> str:
+        return self._details
+
+    def trailing_metadata(self) -> tuple:
+        return self._trailing_metadata
+
+
+class IdeaGenerator:
+    """Seed-derived keyword ideas with metrics drawn from a recorded response."""
+
+    def __init__(self, metrics: List[Dict], total: int):
+        self.metrics = metrics
+        self.total = total
+        self.ideas = lru_cache(maxsize=256)(self._generate)
+
+    def _texts(self, seeds: Tuple[str, ...], url: str, rng: random.Random) -> List[Tuple[str, int]]:
+        """``(text, depth)`` pairs: the seeds first, then ever longer-tail variants."""
+        bases = [seed.strip().lower() for seed in seeds if seed.strip()] or ([brand_name(url)] if url else ["products"])
+        texts = {base: 0 for base in bases}
+        attempts = max(len(_SUFFIXES), -(-self.total // (4 * len(bases))))
+        depth = 0
+        while len(texts) < self.total and depth < 4:
+            depth += 1
+            for base in bases:
+                for _ in range(attempts):
+                    words = [base]
+                    if rng.random() < 0.4:
+                        words.insert(0, rng.choice(_PREFIXES))
+                    words.extend(rng.sample(_SUFFIXES, depth))
+                    texts.setdefault(" ".join(words), depth)
+            rng.shuffle(bases)
+        return list(texts.items())[:self.total]
+
+    def _generate(self, seeds: Tuple[str, ...], url: str) -> List[GenerateKeywordIdeaResult]:
+        rng = random.Random(zlib.crc32("|".join([*sorted(seeds), url]).encode()))
+        results = []
+        for text, depth in self._texts(seeds, url, rng):
+            metrics = dict(rng.choice(self.metrics))
+            # Each added modifier keeps only a fraction of the searches.
+            volume = int(metrics["avg_monthly_searches"])
+            for _ in range(depth):
+                volume *= rng.uniform(0.05, 0.6)
+            metrics["avg_monthly_searches"] = _round_volume(volume)
+            results.append(GenerateKeywordIdeaResult(text=text, keyword_idea_metrics=metrics))
+        return results
+
+
+class FakeKeywordPlanIdeaService:
+    """GenerateKeywordIdeas with injected latency and failures.
+
+    The first page takes ``latency`` and each later page ``page_latency``.
+    ``unavailable_rate`` and ``quota_rate`` are the chances that a page
+    request fails with UNAVAILABLE or RESOURCE_EXHAUSTED, raised as the
+    google.api_core errors the client library produces. Quota failures carry
+    a GoogleAdsFailure in their trailers asking for ``quota_retry_delay``.
+    """
+
+    def __init__(self, generator: IdeaGenerator, latency: Latency, page_latency: Latency,
+                 unavailable_rate: float = 0.0, quota_rate: float = 0.0, quota_retry_delay: float = 1.0,
+                 seed: Optional[int] = None):
+        self.generator = generator
+        self.latency = latency
+        self.page_latency = page_latency
+        self.unavailable_rate = unavailable_rate
+        self.quota_rate = quota_rate
+        self.quota_retry_delay = quota_retry_delay
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.rpcs = 0
+        self.pages = 0
+        self.ideas_served = 0
+        self.failures = 0
+
+    def _failure(self) -> Optional[grpc.StatusCode]:
+        with self._lock:
+            roll = self.rng.random()
+        if roll < self.unavailable_rate:
+            return grpc.StatusCode.UNAVAILABLE
+        if roll < self.unavailable_rate + self.quota_rate:
+            return grpc.StatusCode.RESOURCE_EXHAUSTED
+        return None
+
+    def _error(self, code: grpc.StatusCode) -> api_exceptions.GoogleAPICallError:
+        message = f"Injected {code.name} from the fake KeywordPlanIdeaService"
+        trailing_metadata = ()
+        if code == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            failure = quota_failure(self.quota_retry_delay)
+            trailing_metadata = ((FAILURE_METADATA_KEY, GoogleAdsFailure.serialize(failure)),)
+        return api_exceptions.from_grpc_status(code, message, response=_FailedCall(code, message, trailing_metadata))
+
+    def page(self, request: GenerateKeywordIdeasRequest) -> GenerateKeywordIdeaResponse:
+        start = int(request.page_token or 0)
+        with self._lock:
+            if start == 0:
+                self.rpcs += 1
+        time.sleep((self.latency if start == 0 else self.page_latency).sample())
+        code = self._failure()
+        if code is not None:
+            with self._lock:
+                self.failures += 1
+            raise self._error(code)
+
+        ideas = self.generator.ideas(*_seeds_of(request))
+        end = len(ideas) if not request.page_size else min(len(ideas), start + request.page_size)
+        with self._lock:
+            self.pages += 1
+            self.ideas_served += end - start
+        return GenerateKeywordIdeaResponse(
+            results=ideas[start:end],
+            next_page_token=str(end) if end < len(ideas) else "",
+            total_size=len(ideas),
+        )
+
+    def _results(self, request: GenerateKeywordIdeasRequest) -> Iterator[GenerateKeywordIdeaResult]:
+        # Pages are requested as the consumer reaches them, like the pager.
+        request = GenerateKeywordIdeasRequest(request)
+        while True:
+            response = self.page(request)
+            yield from response.results
+            if not response.next_page_token:
+                return
+            request.page_token = response.next_page_token
+
+    def __call__(self, request, consume, timeout=None):
+        """In-process stand-in for ads_client._generate_keyword_ideas."""
+        return consume(self._results(request))
+
+    def generate_keyword_ideas(self, request: GenerateKeywordIdeasRequest, context) -> GenerateKeywordIdeaResponse:
+        try:
+            return self.page(request)
+        except api_exceptions.GoogleAPICallError as e:
+            context.set_trailing_metadata(e.response.trailing_metadata())
+            context.abort(e.grpc_status_code, e.message)
+
+    def handler(self) -> grpc.GenericRpcHandler:
+        return grpc.method_handlers_generic_handler(SERVICE_NAME, {
+            "GenerateKeywordIdeas": grpc.unary_unary_rpc_method_handler(
+                self.generate_keyword_ideas,
+                request_deserializer=GenerateKeywordIdeasRequest.deserialize,
+                response_serializer=GenerateKeywordIdeaResponse.serialize,
+            ),
+        })
+
+    def stats(self) -> Dict[str, int]:
+        return {"rpcs": self.rpcs, "pages": self.pages, "ideas_served": self.ideas_served, "failures": self.failures}
+
+
+def build_service(ideas: int = 3000, latency: float = 0.4, page_latency: Optional[float] = None,
+                  unavailable_rate: float = 0.0, quota_rate: float = 0.0, quota_retry_delay: float = 1.0,
+                  fixture: Optional[Path] = None, seed: Optional[int] = None) -> FakeKeywordPlanIdeaService:
+    """The service with defaults for each knob; ``page_latency`` defaults to a quarter of ``latency``."""
+    rng = random.Random(seed)
+    metrics = load_recorded_metrics(fixture) if fixture else load_recorded_metrics()
+    page_latency = latency / 4 if page_latency is None else page_latency
+    return FakeKeywordPlanIdeaService(
+        IdeaGenerator(metrics, ideas), Latency(latency, rng=rng), Latency(page_latency, rng=rng),
+        unavailable_rate, quota_rate, quota_retry_delay, seed,
+    )
+
+
+def start_server(service: FakeKeywordPlanIdeaService, address: str = "localhost:50051",
+                 max_workers: int = 32) -> Tuple[grpc.Server, int]:
+    """Start serving on ``address`` (port 0 picks a free port); returns the server and its port."""
+    server = grpc.server(ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fake-google-ads"))
+    server.add_generic_rpc_handlers((service.handler(),))
+    port = server.add_insecure_port(address)
+    server.start()
+    return server, port
+
+
+def add_arguments(parser: argparse.ArgumentParser, prefix: str = ""):
+    parser.add_argument(f"--{prefix}ideas", type=int, default=3000, help="ideas generated per seed set")
+    parser.add_argument(f"--{prefix}latency", type=float, default=0.4, help="seconds for the first page")
+    parser.add_argument(f"--{prefix}page-latency", type=float, help="seconds for each later page (default: latency/4)")
+    parser.add_argument(f"--{prefix}unavailable-rate", type=float, default=0.0, help="share of pages failing UNAVAILABLE")
+    parser.add_argument(f"--{prefix}quota-rate", type=float, default=0.0,
+                        help="share of pages failing RESOURCE_EXHAUSTED")
+    parser.add_argument(f"--{prefix}quota-retry-delay", type=float, default=1.0,
+                        help="retry delay a quota failure asks for, in seconds")
+    parser.add_argument(f"--{prefix}fixture", type=Path, help="recorded keyword_ideas.json to draw metrics from")
+    parser.add_argument(f"--{prefix}workers", type=int, default=32, help="server threads")
+
+
+def service_from_args(args, prefix: str = "") -> FakeKeywordPlanIdeaService:
+    """Build the service from options added by ``add_arguments`` with the same prefix."""
+    dest = prefix.replace("-", "_")
+    names = ("ideas", "latency", "page_latency", "unavailable_rate", "quota_rate", "quota_retry_delay", "fixture")
+    return build_service(**{name: getattr(args, f"{dest}{name}") for name in names})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=50051)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    service = service_from_args(args)
+    server, port = start_server(service, f"{args.host}:{args.port}", args.workers)
+    print(f"✅ Fake KeywordPlanIdeaService listening on {args.host}:{port}")
+    try:
+        server.wait_for_termination()
+    except KeyboardInterrupt:
+        server.stop(grace=1)
+    print(f"Served {service.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Stand-in for Groq's OpenAI-compatible chat completions.
+
+One implementation serves both uses: installed in-process in place of the
+scheduled client by the benchmarks (benchmarks/replay.py), and over HTTP
+for load tests:
+
+    python -m fakes.groq --port 8090 --latency 0.3 --tokens-per-second 800 --rate-limit-rate 0.05
+
+with the backend started with GROQ_BASE_URL=http://localhost:8090. The
+completions are shaped like the ones the planner asks for and built from
+the prompt: seed keywords for the brand in the prompt URL, the prompt's
+keywords grouped into the recorded ad group names, and the recorded PMax
+themes (fixtures/groq_completions.json).
+"""
+import ast
+import json
+import time
+import uuid
+import zlib
+import random
+import asyncio
+import argparse
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+import httpx
+from aiohttp import web
+from groq import InternalServerError, RateLimitError
+from fakes.common import FIXTURES_DIR, Latency, brand_name
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+
+def load_recorded_completions(path: Path = FIXTURES_DIR / "groq_completions.json") -> Dict[str, str]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def operation(system_prompt: str) -> str:
+    if "JSON" in system_prompt:
+        return "cluster_keywords"
+    if "PMax" in system_prompt:
+        return "pmax_themes"
+    return "seed_keywords"
+
+
+def _after(prompt: str, marker: str) -> str:
+    return prompt.split(marker, 1)[1].split("\n", 1)[0].strip() if marker in prompt else ""
+
+
+def _literal_list(text: str) -> list:
+    try:
+        return list(ast.literal_eval(text))
+    except (ValueError, SyntaxError):
+        return []
+
+
+class CompletionWriter:
+    """Writes completions in the planner's formats from the prompt and a recorded session."""
+
+    def __init__(self, recorded: Dict[str, str]):
+        self.seed_keywords = [kw.strip() for kw in recorded["seed_keywords"].split(",") if kw.strip()]
+        self.group_names = list(json.loads(recorded["cluster_keywords"]))
+        self.pmax_themes = recorded["pmax_themes"]
+
+    def write(self, messages: List[Dict[str, str]]) -> str:
+        prompt = messages[-1]["content"]
+        kind = operation(messages[0]["content"])
+        if kind == "cluster_keywords":
+            return self.cluster_keywords(prompt)
+        if kind == "pmax_themes":
+            return self.pmax_themes
+        return self.seeds(prompt)
+
+    def seeds(self, prompt: str) -> str:
+        brand = brand_name(_after(prompt, "URL:"))
+        keywords = [brand] + [f"{brand} {kw}" for kw in self.seed_keywords[:4]] + self.seed_keywords[4:]
+        return ", ".join(keywords)
+
+    def cluster_keywords(self, prompt: str) -> str:
+        groups = {name: [] for name in self.group_names}
+        for keyword in _literal_list(_after(prompt, "Keywords to group:")):
+            # A stable hash over a fixed set of groups, so a keyword always
+            # lands in the same group.
+            groups[self.group_names[zlib.crc32(keyword.encode()) % len(self.group_names)]].append(keyword)
+        return json.dumps({name: group for name, group in groups.items() if group})
+
+
+class FakeGroqCompletions:
+    """Chat completions with injected latency, rate limits and server errors.
+
+    A response takes ``latency`` plus its completion tokens at
+    ``tokens_per_second``. ``rate_limit_rate`` of the calls get a 429 with a
+    ``retry-after`` header and ``error_rate`` of them a 503.
+    """
+
+    def __init__(self, writer: CompletionWriter, latency: Latency, tokens_per_second: float = 0.0,
+                 rate_limit_rate: float = 0.0, error_rate: float = 0.0, retry_after: float = 1.0,
+                 seed: Optional[int] = None):
+        self.writer = writer
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    async def respond(self, body: Dict) -> Tuple[int, Dict, Dict[str, str]]:
+        """Return ``(status, json_body, headers)`` for one completion request."""
+        self.calls += 1
+        roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            self.failures += 1
+            error = {"message": f"Rate limit reached for model `{body.get('model')}` (injected)",
+                     "type": "tokens", "code": "rate_limit_exceeded"}
+            return 429, {"error": error}, {"retry-after": str(self.retry_after)}
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.failures += 1
+            await asyncio.sleep(self.latency.sample())
+            error = {"message": "Service unavailable (injected)", "type": "internal_server_error",
+                     "code": "service_unavailable"}
+            return 503, {"error": error}, {}
+
+        messages = body["messages"]
+        content = self.writer.write(messages)
+        prompt_tokens = sum(len(message["content"]) for message in messages) // 4
+        completion_tokens = min(body.get("max_tokens") or 1024, max(1, len(content) // 4))
+        delay = self.latency.sample()
+        if self.tokens_per_second > 0:
+            delay += completion_tokens / self.tokens_per_second
+        await asyncio.sleep(delay)
+        return 200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "completion_time": delay,
+            },
+            "system_fingerprint": "fp_fake",
+        }, {}
+
+    async def create(self, model, messages, max_tokens, temperature, timeout=None):
+        """In-process stand-in for ``client.chat.completions.create``; raises the SDK's errors."""
+        status, body, headers = await self.respond(
+            {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        )
+        if status != 200:
+            response = httpx.Response(status, json=body, headers=headers,
+                                      request=httpx.Request("POST", f"http://fake-groq{COMPLETIONS_PATH}"))
+            error_class = RateLimitError if status == 429 else InternalServerError
+            raise error_class(body["error"]["message"], response=response, body=body)
+        choice = body["choices"][0]
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(**choice["message"]))],
+            usage=SimpleNamespace(**body["usage"]),
+        )
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        status, body, headers = await self.respond(await request.json())
+        return web.json_response(body, status=status, headers=headers)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(COMPLETIONS_PATH, self._handle)
+        return app
+
+
+def build_completions(latency: float = 0.3, tokens_per_second: float = 800, rate_limit_rate: float = 0.0,
+                      error_rate: float = 0.0, retry_after: float = 1.0, fixture: Optional[Path] = None,
+                      seed: Optional[int] = None) -> FakeGroqCompletions:
+    recorded = load_recorded_completions(fixture) if fixture else load_recorded_completions()
+    return FakeGroqCompletions(
+        CompletionWriter(recorded), Latency(latency, rng=random.Random(seed)), tokens_per_second,
+        rate_limit_rate, error_rate, retry_after, seed,
+    )
+
+
+async def start_server(fake: FakeGroqCompletions, host: str = "localhost", port: int = 8090) -> web.AppRunner:
+    runner = web.AppRunner(fake.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def add_arguments(parser: argparse.ArgumentParser, prefix: str = ""):
+    parser.add_argument(f"--{prefix}latency", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument(f"--{prefix}tokens-per-second", type=float, default=800, help="completion token speed")
+    parser.add_argument(f"--{prefix}rate-limit-rate", type=float, default=0.0, help="share of calls answered 429")
+    parser.add_argument(f"--{prefix}error-rate", type=float, default=0.0, help="share of calls answered 503")
+    parser.add_argument(f"--{prefix}retry-after", type=float, default=1.0, help="retry-after seconds on a 429")
+    parser.add_argument(f"--{prefix}fixture", type=Path, help="recorded groq_completions.json to write from")
+
+
+def completions_from_args(args, prefix: str = "") -> FakeGroqCompletions:
+    """Build the stand-in from options added by ``add_arguments`` with the same prefix."""
+    dest = prefix.replace("-", "_")
+    names = ("latency", "tokens_per_second", "rate_limit_rate", "error_rate", "retry_after", "fixture")
+    return build_completions(**{name: getattr(args, f"{dest}{name}") for name in names})
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8090)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    fake = completions_from_args(args)
+    runner = await start_server(fake, args.host, args.port)
+    print(f"✅ Fake Groq listening on http://{args.host}:{args.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        print(f"Served {fake.calls} calls ({fake.failures} injected failures)")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
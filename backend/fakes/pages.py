@@ -0,0 +1,40 @@
+"""Serves a recorded landing page locally in place of brand sites."""
+import asyncio
+from aiohttp import web
+from fakes.common import Latency
+
+
+class LandingPageServer:
+    """Serves ``html`` for every path on localhost, with an ETag and injected latency."""
+
+    def __init__(self, html: str, latency: Latency):
+        self.html = html
+        self.latency = latency
+        self.etag = f'"{abs(hash(html)):x}"'
+        self.requests = 0
+        self.not_modified = 0
+        self._runner = None
+        self.base_url = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency.sample())
+        if request.headers.get("If-None-Match") == self.etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": self.etag})
+        return web.Response(text=self.html, content_type="text/html", headers={"ETag": self.etag})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
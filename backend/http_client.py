@@ -0,0 +1,70 @@
+import os
+import asyncio
+import aiohttp
+from typing import Dict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FETCH_TIMEOUT = float(os.getenv("URL_FETCH_TIMEOUT", "10"))
+MAX_CONNECTIONS = int(os.getenv("URL_FETCH_MAX_CONNECTIONS", "100"))
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("URL_FETCH_MAX_PER_HOST", "8"))
+KEEPALIVE_TIMEOUT = float(os.getenv("URL_FETCH_KEEPALIVE_TIMEOUT", "30"))
+DNS_CACHE_TTL = int(os.getenv("URL_FETCH_DNS_CACHE_TTL", "300"))
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; SEMPlanner/1.0)",
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+}
+
+# One session per event loop: a session and its pooled connections are bound
+# to the loop that created them.
+_sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Return the running loop's aiohttp session, creating it on first use.
+
+    The session owns a single pooled TCP connector so connections, keep-alive
+    sockets and resolved DNS entries are shared by every in-flight plan.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        _forget_closed_loops()
+        connector = aiohttp.TCPConnector(
+            limit=MAX_CONNECTIONS,
+            limit_per_host=MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            use_dns_cache=True,
+        )
+        session = _sessions[loop] = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT),
+            headers=HEADERS,
+        )
+    return session
+
+
+def _forget_closed_loops():
+    # A loop that ended without close_session() took its sockets with it;
+    # its session can no longer be closed, only dropped.
+    for loop in [loop for loop in _sessions if loop.is_closed()]:
+        del _sessions[loop]
+
+
+async def close_session():
+    """Close the session of every loop that is still running."""
+    _forget_closed_loops()
+    current = asyncio.get_running_loop()
+    closing = []
+    for loop, session in _sessions.items():
+        if session.closed:
+            continue
+        if loop is current:
+            closing.append(session.close())
+        else:
+            closing.append(asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop)))
+    _sessions.clear()
+    await asyncio.gather(*closing)
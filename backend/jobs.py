@@ -0,0 +1,181 @@
+import os
+import time
+import uuid
+import asyncio
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Optional
+from collections import OrderedDict
+from models import PlanRequest, PlanJob, JobStatus
+from sem_plan import generate_full_sem_plan
+from rate_limit import Priority, request_priority
+import tracing
+
+PLAN_JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "4"))
+PLAN_JOB_MAX_QUEUED = int(os.getenv("PLAN_JOB_MAX_QUEUED", "100"))
+PLAN_JOB_TTL = float(os.getenv("PLAN_JOB_TTL", "3600"))
+PLAN_JOB_MAX_STORED = int(os.getenv("PLAN_JOB_MAX_STORED", "1000"))
+
+FINISHED_STATUSES = {JobStatus.succeeded, JobStatus.failed, JobStatus.cancelled}
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobStore(ABC):
+    """Storage interface for plan jobs; swap in another backend by subclassing."""
+
+    @abstractmethod
+    def save(self, job: PlanJob):
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[PlanJob]:
+        ...
+
+    @abstractmethod
+    def delete(self, job_id: str):
+        ...
+
+
+class InMemoryJobStore(JobStore):
+    """Keeps jobs in process memory, dropping finished jobs after ``ttl`` seconds."""
+
+    def __init__(self, ttl: float = PLAN_JOB_TTL, max_size: int = PLAN_JOB_MAX_STORED):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._jobs = OrderedDict()
+        self._finished_at = {}
+
+    def save(self, job: PlanJob):
+        self._jobs[job.job_id] = job
+        if job.status in FINISHED_STATUSES:
+            self._finished_at.setdefault(job.job_id, time.monotonic())
+        self._purge()
+
+    def get(self, job_id: str) -> Optional[PlanJob]:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def delete(self, job_id: str):
+        self._jobs.pop(job_id, None)
+        self._finished_at.pop(job_id, None)
+
+    def _purge(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, finished in self._finished_at.items() if now - finished > self.ttl]
+        for job_id in expired:
+            self.delete(job_id)
+        # Past the size bound, evict the oldest finished jobs; queued and
+        # running jobs are never dropped.
+        for job_id in list(self._finished_at):
+            if len(self._jobs) <= self.max_size:
+                break
+            self.delete(job_id)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class PlanJobQueue:
+    """In-process queue that runs plan jobs on a fixed number of worker tasks."""
+
+    def __init__(self, store: JobStore, workers: int = PLAN_JOB_WORKERS, max_queued: int = PLAN_JOB_MAX_QUEUED):
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self._queue = None
+        self._worker_tasks = []
+        self._running = {}
+        self._cancelled = set()
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._worker_tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def submit(self, request: PlanRequest) -> PlanJob:
+        job = PlanJob(job_id=uuid.uuid4().hex, status=JobStatus.queued, created_at=_now())
+        try:
+            self._queue.put_nowait((job.job_id, request))
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"Plan job queue is full ({self.max_queued} jobs waiting)")
+        self.store.save(job)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[PlanJob]:
+        job = self.store.get(job_id)
+        if job is None or job.status in FINISHED_STATUSES:
+            return job
+        self._cancelled.add(job_id)
+        job.status = JobStatus.cancelled
+        job.finished_at = _now()
+        self.store.save(job)
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return job
+
+    async def _work(self):
+        # Queued jobs are background work and yield upstream quota to
+        # interactive plans.
+        request_priority.set(Priority.batch)
+        while True:
+            job_id, request = await self._queue.get()
+            try:
+                await self._run(job_id, request)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, request: PlanRequest):
+        job = self.store.get(job_id)
+        if job is None or job_id in self._cancelled:
+            self._cancelled.discard(job_id)
+            return
+
+        job.status = JobStatus.running
+        job.started_at = _now()
+        self.store.save(job)
+
+        # Spans of a background job are traced under its job id.
+        tracing.request_id.set(job_id)
+        task = asyncio.create_task(generate_full_sem_plan(request))
+        self._running[job_id] = task
+        error = None
+        try:
+            plan = await task
+            if plan is None:
+                raise RuntimeError("Plan generation returned no result")
+        except asyncio.CancelledError:
+            if job_id not in self._cancelled:
+                task.cancel()
+                raise
+        except Exception as e:
+            error = str(e)
+        finally:
+            self._running.pop(job_id, None)
+            cancelled = job_id in self._cancelled
+            self._cancelled.discard(job_id)
+
+        # cancel() can land after the plan finished but before this resumed;
+        # the job stays cancelled rather than being overwritten.
+        if cancelled:
+            return
+        if error is None:
+            job.result = plan
+            job.status = JobStatus.succeeded
+        else:
+            job.error = error
+            job.status = JobStatus.failed
+        job.finished_at = _now()
+        self.store.save(job)
+
+
+plan_jobs = PlanJobQueue(InMemoryJobStore())
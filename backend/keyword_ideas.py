@@ -0,0 +1,179 @@
+import heapq
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+
+class KeywordIdeas:
+    """Struct-of-arrays container for keyword idea metrics.
+
+    Numeric metrics live in NumPy arrays and texts in a plain list, so the
+    scorer, filters and ad-group aggregation work on whole columns instead of
+    looking up keys in one dict per idea.
+    """
+
+    __slots__ = (
+        "text",
+        "avg_monthly_searches",
+        "competition_level",
+        "competition_index",
+        "low_top_of_page_bid",
+        "high_top_of_page_bid",
+    )
+
+    def __init__(self, text, avg_monthly_searches, competition_level, competition_index,
+                 low_top_of_page_bid, high_top_of_page_bid):
+        self.text = list(text)
+        self.avg_monthly_searches = np.asarray(avg_monthly_searches, dtype=np.int64)
+        self.competition_level = list(competition_level)
+        self.competition_index = np.asarray(competition_index, dtype=np.float64)
+        self.low_top_of_page_bid = np.asarray(low_top_of_page_bid, dtype=np.float64)
+        self.high_top_of_page_bid = np.asarray(high_top_of_page_bid, dtype=np.float64)
+
+    @classmethod
+    def from_results(cls, results: Iterable, min_volume: int = 0, max_ideas: Optional[int] = None,
+                     keep: Optional[int] = None) -> "KeywordIdeas":
+        """Fill the columns straight from GenerateKeywordIdeaResult messages.
+
+        ``results`` may be a lazy pager, so filtering happens as pages arrive:
+        ideas under ``min_volume`` are dropped immediately, iteration stops
+        after ``max_ideas`` ideas so no further pages are requested, and a
+        running min-heap keeps only the ``keep`` highest-volume ideas. The kept
+        ideas stay in the order the API returned them.
+        """
+        kept = []
+        for seq, idea in enumerate(results):
+            metrics = idea.keyword_idea_metrics
+            volume = metrics.avg_monthly_searches
+            if volume >= min_volume:
+                row = (
+                    idea.text,
+                    volume,
+                    metrics.competition.name,
+                    metrics.competition_index,
+                    metrics.low_top_of_page_bid_micros,
+                    metrics.high_top_of_page_bid_micros,
+                )
+                if keep is None:
+                    kept.append((volume, -seq, row))
+                elif len(kept) < keep:
+                    heapq.heappush(kept, (volume, -seq, row))
+                elif volume > kept[0][0]:
+                    heapq.heapreplace(kept, (volume, -seq, row))
+            if max_ideas is not None and seq + 1 >= max_ideas:
+                break
+
+        if keep is not None:
+            kept.sort(key=lambda item: -item[1])
+        rows = [row for _, _, row in kept]
+        if not rows:
+            return cls([], [], [], [], [], [])
+        text, volumes, levels, competition, low_bids, high_bids = zip(*rows)
+        return cls(
+            text, volumes, levels, competition,
+            np.asarray(low_bids, dtype=np.float64) / 1e6,
+            np.asarray(high_bids, dtype=np.float64) / 1e6,
+        )
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> "KeywordIdeas":
+        return cls(
+            [kw['text'] for kw in records],
+            [kw['avg_monthly_searches'] for kw in records],
+            [kw.get('competition_level', 'UNSPECIFIED') for kw in records],
+            [kw['competition_index'] for kw in records],
+            [kw['low_top_of_page_bid'] for kw in records],
+            [kw['high_top_of_page_bid'] for kw in records],
+        )
+
+    @classmethod
+    def concat(cls, parts: List["KeywordIdeas"]) -> "KeywordIdeas":
+        """Join idea sets, keeping the first row for each normalized keyword."""
+        if len(parts) == 1:
+            return parts[0]
+        columns = {name: [] for name in cls.__slots__}
+        seen = set()
+        for part in parts:
+            for row in part.records():
+                key = normalize_keyword(row["text"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                for name in cls.__slots__:
+                    columns[name].append(row[name])
+        return cls(**columns)
+
+    def limit(self, max_ideas: Optional[int] = None, keep: Optional[int] = None) -> "KeywordIdeas":
+        """Apply ``from_results``' limits to ideas that are already collected.
+
+        The first ``max_ideas`` ideas are considered, and of those the ``keep``
+        highest-volume ideas stay, in their original order.
+        """
+        size = len(self) if max_ideas is None else min(len(self), max_ideas)
+        if keep is None or keep >= size:
+            return self if size == len(self) else self.take(np.arange(size))
+        # Stable, so ties keep the earlier idea like the heap in from_results.
+        top = np.argsort(-self.avg_monthly_searches[:size], kind="stable")[:keep]
+        return self.take(np.sort(top))
+
+    @classmethod
+    def from_dict(cls, columns: Dict[str, list]) -> "KeywordIdeas":
+        return cls(**columns)
+
+    def to_dict(self) -> Dict[str, list]:
+        """Plain-list columns, suitable for JSON and the on-disk cache."""
+        return {
+            "text": list(self.text),
+            "avg_monthly_searches": self.avg_monthly_searches.tolist(),
+            "competition_level": list(self.competition_level),
+            "competition_index": self.competition_index.tolist(),
+            "low_top_of_page_bid": self.low_top_of_page_bid.tolist(),
+            "high_top_of_page_bid": self.high_top_of_page_bid.tolist(),
+        }
+
+    def records(self) -> List[Dict]:
+        columns = self.to_dict()
+        return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+    def take(self, indices) -> "KeywordIdeas":
+        indices = np.asarray(indices, dtype=np.intp)
+        return KeywordIdeas(
+            [self.text[i] for i in indices],
+            self.avg_monthly_searches[indices],
+            [self.competition_level[i] for i in indices],
+            self.competition_index[indices],
+            self.low_top_of_page_bid[indices],
+            self.high_top_of_page_bid[indices],
+        )
+
+    def filter(self, mask: np.ndarray) -> "KeywordIdeas":
+        return self.take(np.flatnonzero(mask))
+
+    @property
+    def avg_bid(self) -> np.ndarray:
+        return (self.low_top_of_page_bid + self.high_top_of_page_bid) / 2
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+
+def normalize_keyword(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class KeywordIndex:
+    """Hash index from normalized keyword text to its row in a KeywordIdeas set."""
+
+    def __init__(self, ideas: KeywordIdeas):
+        self.ideas = ideas
+        self._rows = {}
+        for row, text in enumerate(ideas.text):
+            self._rows.setdefault(normalize_keyword(text), row)
+
+    def row(self, keyword: str) -> Optional[int]:
+        return self._rows.get(normalize_keyword(keyword))
+
+    def __contains__(self, keyword: str) -> bool:
+        return normalize_keyword(keyword) in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
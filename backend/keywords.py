@@ -1,57 +1,113 @@
 import os
-from typing import List, Dict
-from google.ads.googleads.client import GoogleAdsClient
+import asyncio
+from functools import partial
+from typing import List
 from google.ads.googleads.errors import GoogleAdsException
 from dotenv import load_dotenv
+from ads_client import get_client, generate_keyword_ideas
+from cache import build_cache, make_key, SingleFlight
+from metrics import watch_cache
+import tracing
+from keyword_ideas import KeywordIdeas, normalize_keyword
 
 load_dotenv()
 
-async def get_keyword_ideas_1(url: str) -> List[Dict]:
-    client = GoogleAdsClient.load_from_storage()
-    customer_id = os.getenv("GOOGLE_ADS_CUSTOMER_ID")
+# GenerateKeywordIdeas accepts at most 20 keyword seeds per request.
+MAX_KEYWORD_SEEDS = 20
+KEYWORD_IDEAS_PAGE_SIZE = int(os.getenv("KEYWORD_IDEAS_PAGE_SIZE", "1000"))
+KEYWORD_IDEAS_MAX = int(os.getenv("KEYWORD_IDEAS_MAX", "5000"))
+KEYWORD_IDEAS_KEEP = int(os.getenv("KEYWORD_IDEAS_KEEP", "2000"))
+LANGUAGE_ID = os.getenv("GOOGLE_ADS_LANGUAGE_ID", "")
+GEO_TARGET_IDS = [geo.strip() for geo in os.getenv("GOOGLE_ADS_GEO_TARGET_IDS", "").split(",") if geo.strip()]
+
+keyword_idea_cache = build_cache(
+    max_size=int(os.getenv("KEYWORD_CACHE_MAX_ENTRIES", "512")),
+    ttl=float(os.getenv("KEYWORD_CACHE_TTL", "86400")),
+    db_path=os.getenv("KEYWORD_CACHE_DB") or None,
+    table="keyword_ideas",
+)
+watch_cache("keyword_ideas", keyword_idea_cache)
+_idea_fetches = SingleFlight()
+
+
+def _normalize_seeds(seed_keywords: List[str]) -> List[str]:
+    return sorted({normalize_keyword(kw) for kw in seed_keywords})
+
 
-    keyword_plan_idea_service = client.get_service("KeywordPlanIdeaService")
+def _seed_chunks(seed_keywords: List[str]) -> List[List[str]]:
+    """Split the unique seeds into lists the API accepts in one request."""
+    unique = list(dict.fromkeys(normalize_keyword(kw) for kw in seed_keywords))
+    return [unique[start:start + MAX_KEYWORD_SEEDS] for start in range(0, len(unique), MAX_KEYWORD_SEEDS)] or [[]]
+
+
+async def _request_keyword_ideas(customer_id: str, url: str, seed_keywords: List[str], min_volume: int,
+                                 max_ideas: int, keep: int) -> KeywordIdeas:
+    client = get_client()
     request = client.get_type("GenerateKeywordIdeasRequest")
     request.customer_id = customer_id
-    if url:
+    request.page_size = min(KEYWORD_IDEAS_PAGE_SIZE, max_ideas)
+    if LANGUAGE_ID:
+        request.language = f"languageConstants/{LANGUAGE_ID}"
+    if GEO_TARGET_IDS:
+        request.geo_target_constants.extend(f"geoTargetConstants/{geo}" for geo in GEO_TARGET_IDS)
+    # keyword_seed, url_seed and keyword_and_url_seed share a oneof, so setting
+    # one after another silently drops the first.
+    if seed_keywords and url:
+        request.keyword_and_url_seed.keywords.extend(seed_keywords)
+        request.keyword_and_url_seed.url = url
+    elif seed_keywords:
+        request.keyword_seed.keywords.extend(seed_keywords)
+    elif url:
         request.url_seed.url = url
 
     try:
-        response = keyword_plan_idea_service.generate_keyword_ideas(request=request)
-        results = []
-        for idea in response.results:
-            results.append(idea.text)
-        return results
+        return await generate_keyword_ideas(
+            request,
+            partial(KeywordIdeas.from_results, min_volume=min_volume, max_ideas=max_ideas, keep=keep),
+        )
     except GoogleAdsException as ex:
         print(f"Google Ads API error: {ex}")
         raise
 
 
-
-async def get_keyword_ideas_2(seed_keywords: List[str], competitor_url: str) -> List[Dict]:
-    client = GoogleAdsClient.load_from_storage()
+async def _fetch_keyword_ideas(seed_keywords: List[str], url: str, min_volume: int = 0,
+                               max_ideas: int = KEYWORD_IDEAS_MAX, keep: int = None) -> KeywordIdeas:
     customer_id = os.getenv("GOOGLE_ADS_CUSTOMER_ID")
+    seed_keywords = [kw for kw in (seed_keywords or []) if kw and kw.strip()]
+    cache_key = make_key(
+        customer_id, _normalize_seeds(seed_keywords), url or "", LANGUAGE_ID, GEO_TARGET_IDS,
+        min_volume, max_ideas, keep,
+    )
 
-    keyword_plan_idea_service = client.get_service("KeywordPlanIdeaService")
-    request = client.get_type("GenerateKeywordIdeasRequest")
-    request.customer_id = customer_id
-    request.keyword_seed.keywords.extend(seed_keywords)
-    if competitor_url:
-        request.url_seed.url = competitor_url
+    async def fetch() -> KeywordIdeas:
+        chunks = _seed_chunks(seed_keywords)
+        with tracing.span("keyword_ideas.fetch", rpcs=len(chunks)):
+            parts = await asyncio.gather(*(
+                _request_keyword_ideas(customer_id, url, chunk, min_volume, max_ideas, keep) for chunk in chunks
+            ))
+        # Over 20 seeds take several RPCs, each with its own limits.
+        ideas = KeywordIdeas.concat(parts).limit(max_ideas, keep)
+        keyword_idea_cache.set(cache_key, ideas.to_dict())
+        return ideas
 
-    try:
-        response = keyword_plan_idea_service.generate_keyword_ideas(request=request)
-        results = []
-        for idea in response.results:
-            results.append({
-                "text": idea.text,
-                "avg_monthly_searches": idea.keyword_idea_metrics.avg_monthly_searches,
-                "competition_level": idea.keyword_idea_metrics.competition.name,
-                "competition_index": idea.keyword_idea_metrics.competition_index,
-                "low_top_of_page_bid": idea.keyword_idea_metrics.low_top_of_page_bid_micros / 1e6,
-                "high_top_of_page_bid": idea.keyword_idea_metrics.high_top_of_page_bid_micros / 1e6,
-            })
-        return results
-    except GoogleAdsException as ex:
-        print(f"Google Ads API error: {ex}")
-        raise
+    with tracing.span("keyword_ideas", url=url, seeds=len(seed_keywords), min_volume=min_volume) as current:
+        cached = keyword_idea_cache.get(cache_key)
+        current.set_attribute("cache_hit", cached is not None)
+        if cached is not None:
+            ideas = KeywordIdeas.from_dict(cached)
+        else:
+            ideas = await _idea_fetches.do(cache_key, fetch)
+        current.set_attribute("ideas", len(ideas))
+        return ideas
+
+
+async def get_keyword_ideas_1(url: str) -> List[str]:
+    # Only the first ideas are used as seeds, so stop reading once we have them.
+    ideas = await _fetch_keyword_ideas([], url, max_ideas=MAX_KEYWORD_SEEDS)
+    return ideas.text
+
+
+async def get_keyword_ideas_2(seed_keywords: List[str], competitor_url: str, min_monthly_searches: int = 0) -> KeywordIdeas:
+    return await _fetch_keyword_ideas(
+        seed_keywords, competitor_url, min_volume=min_monthly_searches, keep=KEYWORD_IDEAS_KEEP
+    )
@@ -1,16 +1,233 @@
 from typing import List, Dict
 import os
 import json
-from groq import Groq
+import asyncio
+import httpx
+from groq import AsyncGroq, DefaultAsyncHttpxClient, RateLimitError, APIConnectionError, InternalServerError
 from dotenv import load_dotenv
+from cache import build_cache, make_key, SingleFlight
+from rate_limit import QuotaWaitTimeout, RequestTokenBudget
+from resilience import RetryPolicy, call_with_retries, bounded
+from metrics import observe_upstream, observe_queue_wait, watch_cache
+import tracing
 
 load_dotenv()
 
-client = Groq(
+# Point at a local stand-in such as fakes/groq.py; None uses the Groq API.
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = float(os.getenv("GROQ_TPM", "6000"))
+GROQ_FALLBACK_MODEL = os.getenv("GROQ_FALLBACK_MODEL", "")
+GROQ_FALLBACK_RPM = float(os.getenv("GROQ_FALLBACK_RPM", "30"))
+GROQ_FALLBACK_TPM = float(os.getenv("GROQ_FALLBACK_TPM", "6000"))
+# Route to the fallback model once the primary model's queue is longer than this.
+GROQ_FALLBACK_AFTER = float(os.getenv("GROQ_FALLBACK_AFTER", "2"))
+GROQ_MAX_QUEUE_WAIT = float(os.getenv("GROQ_MAX_QUEUE_WAIT", "30"))
+GROQ_RETRY_AFTER_DEFAULT = float(os.getenv("GROQ_RETRY_AFTER_DEFAULT", "2"))
+
+client = AsyncGroq(
     api_key=os.getenv("GROQ_API_KEY", os.getenv("GROK_API_KEY", "your_groq_api_key_here")),
+    base_url=GROQ_BASE_URL,
+    timeout=GROQ_TIMEOUT,
+    max_retries=GROQ_MAX_RETRIES,
+    http_client=DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+        ),
+        timeout=httpx.Timeout(GROQ_TIMEOUT, connect=5.0),
+    ),
+)
+
+LLM_CACHE_DISABLED = os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+completion_cache = build_cache(
+    max_size=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024")),
+    ttl=float(os.getenv("LLM_CACHE_TTL", "21600")),
+    db_path=os.getenv("LLM_CACHE_DB") or None,
+    table="llm_completions",
 )
+watch_cache("llm_completions", completion_cache)
+
+_concurrency = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+_completions_in_flight = SingleFlight()
+
+# Rate limits and transient errors are retried below with the account's
+# budgets, so the SDK's own retry loop is turned off for scheduled calls.
+_scheduled_client = client.with_options(max_retries=0)
+_budgets = {GROQ_MODEL: RequestTokenBudget(GROQ_RPM, GROQ_TPM)}
+if GROQ_FALLBACK_MODEL:
+    _budgets[GROQ_FALLBACK_MODEL] = RequestTokenBudget(GROQ_FALLBACK_RPM, GROQ_FALLBACK_TPM)
+
+
+class LLMBudgetExhausted(QuotaWaitTimeout):
+    """Raised when no model's RPM/TPM budget can admit a completion within GROQ_MAX_QUEUE_WAIT."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Rough TPM cost of a call: ~4 characters per prompt token plus the completion cap."""
+    return sum(len(message["content"]) for message in messages) // 4 + max_tokens
+
 
-async def generate_seed_keywords(url: str) -> List[str]:
+def _pick_model(estimated_tokens: int) -> str:
+    if not GROQ_FALLBACK_MODEL:
+        return GROQ_MODEL
+    primary_delay = _budgets[GROQ_MODEL].delay(estimated_tokens)
+    if primary_delay <= GROQ_FALLBACK_AFTER:
+        return GROQ_MODEL
+    if _budgets[GROQ_FALLBACK_MODEL].delay(estimated_tokens) < primary_delay:
+        return GROQ_FALLBACK_MODEL
+    return GROQ_MODEL
+
+
+async def _acquire_budget(model: str, estimated_tokens: int) -> str:
+    """Reserve a call on ``model``'s budget, or on another model's; return the model reserved on.
+
+    Raises LLMBudgetExhausted when no configured model can admit the call in time.
+    """
+    max_wait = bounded(GROQ_MAX_QUEUE_WAIT)
+    candidates = [model] + [other for other in _budgets if other != model]
+    for candidate in candidates:
+        try:
+            await _budgets[candidate].acquire(estimated_tokens, max_wait)
+        except QuotaWaitTimeout as e:
+            print(f"⚠️  Groq budget for {candidate} exhausted: {e}")
+            continue
+        return candidate
+    retry_after = min(_budgets[candidate].delay(estimated_tokens) for candidate in candidates)
+    raise LLMBudgetExhausted(f"LLM budget exhausted; retry in {retry_after:.0f}s", retry_after)
+
+
+def _retry_after(error: RateLimitError) -> float:
+    headers = error.response.headers
+    for header, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        try:
+            return float(headers[header]) / scale
+        except (KeyError, ValueError):
+            continue
+    return GROQ_RETRY_AFTER_DEFAULT
+
+
+RATE_LIMIT_RETRY = RetryPolicy(retries=GROQ_MAX_RETRIES, base_delay=0, max_delay=0)
+TRANSIENT_RETRY = RetryPolicy(retries=GROQ_MAX_RETRIES, base_delay=0.5, max_delay=8)
+
+
+def _classify_groq_error(error: Exception):
+    # The wait after a 429 is enforced by the blocked budget, so that retry
+    # needs no extra backoff of its own.
+    if isinstance(error, RateLimitError):
+        return RATE_LIMIT_RETRY
+    if isinstance(error, (APIConnectionError, InternalServerError)):
+        return TRANSIENT_RETRY
+    return None
+
+
+async def _attempt_completion(messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+                              estimated_tokens: int) -> str:
+    with observe_queue_wait("groq"):
+        model = await _acquire_budget(_pick_model(estimated_tokens), estimated_tokens)
+    budget = _budgets[model]
+    try:
+        async with _concurrency:
+            with observe_upstream("groq", model), \
+                    tracing.span("groq.chat_completion", model=model, estimated_tokens=estimated_tokens) as current:
+                response = await _scheduled_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout=bounded(GROQ_TIMEOUT),
+                )
+                if response.usage is not None:
+                    current.set_attributes(
+                        prompt_tokens=response.usage.prompt_tokens,
+                        completion_tokens=response.usage.completion_tokens,
+                        total_tokens=response.usage.total_tokens,
+                    )
+    except RateLimitError as e:
+        delay = _retry_after(e)
+        budget.block_for(delay)
+        print(f"⚠️  Groq rate limit on {model}; blocked for {delay:.1f}s")
+        raise
+    except (APIConnectionError, InternalServerError):
+        budget.release(estimated_tokens)
+        raise
+
+    if response.usage is not None:
+        budget.tokens.refund(estimated_tokens - response.usage.total_tokens)
+    return response.choices[0].message.content
+
+
+async def _create_completion(messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
+    """Run one chat completion within the RPM/TPM budgets.
+
+    A 429 blocks that model's budget for the retry-after period; the retry
+    then goes to the fallback model if it would be served sooner. A call the
+    chosen model's budget cannot admit in time goes to the other model, and
+    raises LLMBudgetExhausted when neither can. Connection errors and 5xx
+    responses are retried with jittered backoff.
+    """
+    estimated_tokens = _estimate_tokens(messages, max_tokens)
+    return await call_with_retries(
+        lambda: _attempt_completion(messages, max_tokens, temperature, estimated_tokens),
+        _classify_groq_error,
+        "Groq completion",
+    )
+
+
+async def _complete(system_prompt: str, prompt: str, max_tokens: int, temperature: float,
+                    bypass_cache: bool = False, parse=None, operation: str = "completion"):
+    """Return the completion text, or ``parse(text)`` when a parser is given.
+
+    Completions are cached by a hash of the prompt and sampling settings, and
+    identical prompts already in flight share one request. A completion is
+    only cached once ``parse`` accepts it, so malformed output is retried on
+    the next call rather than replayed.
+    """
+    parse = parse or (lambda text: text)
+    use_cache = not (bypass_cache or LLM_CACHE_DISABLED)
+    cache_key = make_key(GROQ_MODEL, system_prompt, prompt, max_tokens, temperature)
+    prompt_chars = len(system_prompt) + len(prompt)
+    with tracing.span(f"llm.{operation}", prompt_chars=prompt_chars, max_tokens=max_tokens) as current:
+        if use_cache:
+            cached = completion_cache.get(cache_key)
+            current.set_attribute("cache_hit", cached is not None)
+            if cached is not None:
+                return parse(cached)
+
+        def request():
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ]
+            return _create_completion(messages, max_tokens, temperature)
+
+        if use_cache:
+            content = await _completions_in_flight.do(cache_key, request)
+        else:
+            content = await request()
+        current.set_attribute("completion_chars", len(content or ""))
+        result = parse(content)
+        if use_cache and content:
+            completion_cache.set(cache_key, content)
+        return result
+
+
+async def close_client():
+    await client.close()
+
+
+async def generate_seed_keywords(url: str, bypass_cache: bool = False) -> List[str]:
     prompt = f"""Act as an expert SEM strategist with 15 years of experience in e-commerce.
                  Analyze the content of the website given. Based on the specific products and services offered, generate a list of 15 seed keywords that capture the core offerings.
                  Prioritize keywords that a potential customer ready to make a purchase would use. Return the keywords as a comma-separated list.
@@ -18,25 +235,33 @@ async def generate_seed_keywords(url: str) -> List[str]:
 """
 
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
-                {"role": "system", "content": "You are an expert SEM strategist with 15 years of experience in e-commerce."},
-                {"role": "user", "content": prompt}
-            ],
+        keywords_text = await _complete(
+            "You are an expert SEM strategist with 15 years of experience in e-commerce.",
+            prompt,
             max_tokens=500,
-            temperature=0.3
+            temperature=0.3,
+            bypass_cache=bypass_cache,
+            operation="seed_keywords"
         )
-
-        keywords_text = response.choices[0].message.content
         keywords = keywords_text.split(',') if ',' in keywords_text else keywords_text.split('\n')
         return [kw.strip() for kw in keywords if kw.strip()]
 
+    except LLMBudgetExhausted:
+        raise
     except Exception as e:
         print(f"Groq API error in generate_seed_keywords: {e}")
         return
     
-async def cluster_keywords(keywords: List[str]) -> Dict[str, List[str]]:
+def _parse_ad_groups(response_text: str) -> Dict[str, List[str]]:
+    response_text = response_text.strip()
+    if '```json' in response_text:
+        response_text = response_text.split('```json')[1].split('```')[0].strip()
+    elif '```' in response_text:
+        response_text = response_text.split('```')[1].strip()
+
+    return json.loads(response_text)
+
+async def cluster_keywords(keywords: List[str], bypass_cache: bool = False) -> Dict[str, List[str]]:
     prompt = f"""Act as a senior Google Ads specialist organizing a new search campaign given a list of high-potential keywords for a brand.
 Group the keywords into 5-7 distinct, tightly themed ad groups using logical segmentation. Each group should have a concise name and a list of related keywords.
 The segmentation strategy should follow established best practices, creating distinct ad groups for different types of user intent:
@@ -57,30 +282,24 @@ Example format:
 {{"Brand Terms": ["keyword1", "keyword2"], "Product Category": ["keyword3", "keyword4"]}}"""
 
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
-                {"role": "system", "content": "You are a senior Google Ads specialist. Return only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
+        ad_groups = await _complete(
+            "You are a senior Google Ads specialist. Return only valid JSON.",
+            prompt,
             max_tokens=1000,
-            temperature=0.3
+            temperature=0.3,
+            bypass_cache=bypass_cache,
+            parse=_parse_ad_groups,
+            operation="cluster_keywords"
         )
-
-        response_text = response.choices[0].message.content.strip()
-        if '```json' in response_text:
-            response_text = response_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in response_text:
-            response_text = response_text.split('```')[1].strip()
-
-        ad_groups = json.loads(response_text)
         return ad_groups
 
+    except LLMBudgetExhausted:
+        raise
     except Exception as e:
         print(f"Groq API error in cluster_keywords: {e}")
         return
 
-async def generate_pmax_themes(ad_group_themes: List[str]) -> List[str]:
+async def generate_pmax_themes(ad_group_themes: List[str], bypass_cache: bool = False) -> List[str]:
     prompt = f"""Act as a Google Ads AI strategist.
 Generate 6 concise Search Themes for a Performance Max campaign based on these ad group themes.
 Each theme should be a short phrase, up to 80 characters, covering:
@@ -94,17 +313,14 @@ Return themes as a simple list, one per line.
 Ad group themes: {ad_group_themes}"""
 
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
-                {"role": "system", "content": "You are a Google Ads AI strategist. Generate concise PMax themes."},
-                {"role": "user", "content": prompt}
-            ],
+        themes_text = await _complete(
+            "You are a Google Ads AI strategist. Generate concise PMax themes.",
+            prompt,
             max_tokens=400,
-            temperature=0.4
+            temperature=0.4,
+            bypass_cache=bypass_cache,
+            operation="pmax_themes"
         )
-
-        themes_text = response.choices[0].message.content
         themes = themes_text.split('\n') if '\n' in themes_text else themes_text.split(',')
         clean_themes = []
         for theme in themes:
@@ -116,6 +332,8 @@ Ad group themes: {ad_group_themes}"""
 
         return clean_themes[:6]
 
+    except LLMBudgetExhausted:
+        raise
     except Exception as e:
         print(f"Groq API error in generate_pmax_themes: {e}")
         return 
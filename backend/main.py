@@ -1,8 +1,31 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import api_endpoints
+from http_client import close_session
+from llm_calls import close_client
+import ads_client
+from jobs import plan_jobs
+import tracing
 
-app = FastAPI(title="SEM Planning Engine API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ads_client.warm_up()
+    token_refresher = asyncio.create_task(ads_client.keep_credentials_fresh())
+    await plan_jobs.start()
+    yield
+    await plan_jobs.stop()
+    token_refresher.cancel()
+    await close_session()
+    await close_client()
+    ads_client.shutdown_executor()
+    tracing.shutdown()
+
+
+app = FastAPI(title="SEM Planning Engine API", lifespan=lifespan)
 
 origins = [
     "http://localhost:5173",
@@ -20,9 +43,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID") or tracing.new_id()
+    tracing.request_id.set(request_id)
+    with tracing.span("http.request", method=request.method, path=request.url.path) as current:
+        response = await call_next(request)
+        current.set_attribute("status_code", response.status_code)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 # Include the API router
 app.include_router(api_endpoints.router, prefix="/api/v1")
 
 @app.get("/", tags=["Root"])
 async def read_root():
-    return {"message": "Welcome to the SEM Planning Engine API"}
\ No newline at end of file
+    return {"message": "Welcome to the SEM Planning Engine API"}
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,133 @@
+import time
+import asyncio
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Plans take seconds, upstream calls tens of milliseconds to tens of seconds.
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+PLAN_SECONDS = Histogram(
+    "sem_plan_duration_seconds", "End-to-end plan generation time.", ["outcome"], buckets=LATENCY_BUCKETS
+)
+PLANS_IN_FLIGHT = Gauge("sem_plans_in_flight", "Plans currently being generated.")
+MOCK_FALLBACKS = Counter(
+    "sem_plan_mock_fallbacks_total", "Plans that fell back to mock data, by the stage that failed.", ["stage"]
+)
+STAGE_SECONDS = Histogram(
+    "sem_plan_stage_duration_seconds", "Time spent in each pipeline stage.", ["stage"], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_SECONDS = Histogram(
+    "sem_upstream_call_duration_seconds", "Time spent in each upstream call attempt.",
+    ["upstream", "operation", "outcome"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_QUEUE_SECONDS = Histogram(
+    "sem_upstream_queue_wait_seconds", "Time spent waiting for upstream rate-limit budget.",
+    ["upstream"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_IN_FLIGHT = Gauge("sem_upstream_calls_in_flight", "Upstream calls currently running.", ["upstream"])
+UPSTREAM_ERRORS = Counter("sem_upstream_errors_total", "Failed upstream call attempts.", ["upstream", "error"])
+
+
+@contextmanager
+def observe_upstream(upstream: str, operation: str):
+    """Time one upstream call attempt and count it as in flight while it runs."""
+    in_flight = UPSTREAM_IN_FLIGHT.labels(upstream)
+    in_flight.inc()
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception as e:
+        outcome = "error"
+        UPSTREAM_ERRORS.labels(upstream, type(e).__name__).inc()
+        raise
+    finally:
+        UPSTREAM_SECONDS.labels(upstream, operation, outcome).observe(time.perf_counter() - start)
+        in_flight.dec()
+
+
+@contextmanager
+def observe_queue_wait(upstream: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        UPSTREAM_QUEUE_SECONDS.labels(upstream).observe(time.perf_counter() - start)
+
+
+class PlanObservation:
+    __slots__ = ("outcome",)
+
+    def __init__(self):
+        self.outcome = "live"
+
+
+@contextmanager
+def observe_plan():
+    """Time a plan and count it in flight; set ``outcome`` on the yielded object to relabel it."""
+    observation = PlanObservation()
+    PLANS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+        yield observation
+    except asyncio.CancelledError:
+        observation.outcome = "cancelled"
+        raise
+    except BaseException:
+        observation.outcome = "error"
+        raise
+    finally:
+        PLAN_SECONDS.labels(observation.outcome).observe(time.perf_counter() - start)
+        PLANS_IN_FLIGHT.dec()
+
+
+def observe_stage_timings(timings: Dict[str, float]):
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+_caches = {}
+_stats_sources = {}
+
+
+def watch_cache(name: str, cache):
+    """Export a TieredCache's hit, miss and size counts."""
+    _caches[name] = cache
+
+
+def watch_stats(name: str, stats: Callable[[], Dict[str, float]], counters: Iterable[str] = ()):
+    """Export each field of ``stats()`` as ``sem_<name>_<field>``.
+
+    Fields listed in ``counters`` are monotonic totals; the rest are gauges.
+    """
+    _stats_sources[name] = (stats, set(counters))
+
+
+class _StatsCollector:
+    """Reads cache and queue statistics at scrape time instead of mirroring them."""
+
+    def collect(self):
+        hits = CounterMetricFamily("sem_cache_hits", "Cache lookups that found a live entry.", labels=["cache"])
+        misses = CounterMetricFamily("sem_cache_misses", "Cache lookups that found nothing.", labels=["cache"])
+        size = GaugeMetricFamily("sem_cache_entries", "Entries in the in-memory cache tier.", labels=["cache"])
+        for name, cache in _caches.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            size.add_metric([name], stats["size"])
+        yield hits
+        yield misses
+        yield size
+
+        for name, (stats, counters) in _stats_sources.items():
+            for field, value in stats().items():
+                metric_name = f"sem_{name}_{field}"
+                if field in counters:
+                    yield CounterMetricFamily(metric_name, f"{name} {field}.", value=value)
+                else:
+                    yield GaugeMetricFamily(metric_name, f"{name} {field}.", value=value)
+
+
+REGISTRY.register(_StatsCollector())
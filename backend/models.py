@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict
+from typing import List, Dict, Optional
+from datetime import datetime
+from enum import Enum
 
 class PlanRequest(BaseModel):
     brand_url: str = Field(..., example="https://www.mybrand.com")
@@ -33,3 +35,36 @@ class PlanResponse(BaseModel):
     search_campaign_plan: SearchCampaignPlan
     pmax_plan: PMaxPlan
     shopping_campaign_plan: ShoppingCampaignPlan
+
+class PlanFallback(BaseModel):
+    failed_stage: str
+    detail: str
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+    cancelled = "cancelled"
+
+class PlanJob(BaseModel):
+    job_id: str
+    status: JobStatus
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[PlanResponse] = None
+    error: Optional[str] = None
+
+class BatchPlanRequest(BaseModel):
+    plans: List[PlanRequest] = Field(..., min_length=1)
+
+class BatchPlanItem(BaseModel):
+    index: int
+    result: Optional[PlanResponse] = None
+    error: Optional[str] = None
+
+class BatchPlanResponse(BaseModel):
+    results: List[BatchPlanItem]
+    succeeded: int
+    failed: int
@@ -0,0 +1,70 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+import tracing
+
+
+class StageError(Exception):
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"Stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class StageGraph:
+    """A small DAG executor for the plan pipeline.
+
+    Each stage is an async callable that receives the results of its
+    dependencies as positional arguments. A stage starts as soon as all of its
+    dependencies have finished, so independent stages run concurrently.
+    """
+
+    def __init__(self):
+        self._stages = {}
+        self.timings: Dict[str, float] = {}
+
+    def add(self, name: str, func: Callable[..., Awaitable[Any]], deps: Iterable[str] = ()):
+        if name in self._stages:
+            raise ValueError(f"Stage '{name}' is already defined")
+        deps = tuple(deps)
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = (func, deps)
+
+    async def _run_stage(self, name, func, deps, tasks, on_stage_complete):
+        args = [await tasks[dep] for dep in deps]
+        start = time.perf_counter()
+        try:
+            with tracing.span(f"stage.{name}"):
+                result = await func(*args)
+        except Exception as e:
+            raise StageError(name, e) from e
+        finally:
+            self.timings[name] = time.perf_counter() - start
+        if on_stage_complete is not None:
+            on_stage_complete(name, result)
+        return result
+
+    async def run(self, on_stage_complete: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """Run every stage and return their results keyed by stage name.
+
+        ``on_stage_complete(name, result)`` is called as soon as each stage
+        succeeds, before dependent stages start.
+        """
+        tasks = {}
+        for name, (func, deps) in self._stages.items():
+            tasks[name] = asyncio.create_task(self._run_stage(name, func, deps, tasks, on_stage_complete))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return {name: task.result() for name, task in tasks.items()}
+
+    def format_timings(self) -> str:
+        return ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.timings.items())
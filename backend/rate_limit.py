@@ -0,0 +1,188 @@
+import time
+import asyncio
+import itertools
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Dict, Optional
+
+
+class Priority(IntEnum):
+    """Scheduling class of a request; lower values are served first."""
+    interactive = 0
+    batch = 1
+
+
+# Set by batch and background callers; interactive plans use the default.
+request_priority: ContextVar[Priority] = ContextVar("request_priority", default=Priority.interactive)
+
+
+class QuotaWaitTimeout(Exception):
+    """Raised when a request cannot be admitted before its deadline."""
+
+
+class TokenBucket:
+    """Refills ``rate`` tokens per second up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float = 1, now: Optional[float] = None) -> float:
+        """Seconds until ``amount`` tokens are available; 0 if they are now."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        blocked = max(0.0, self.blocked_until - now)
+        # A request larger than the bucket waits for a full bucket rather than forever.
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return blocked
+        return max(blocked, (amount - self.tokens) / self.rate)
+
+    def consume(self, amount: float = 1):
+        """Take ``amount`` tokens; the balance may go negative to reserve future capacity."""
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def block_for(self, seconds: float):
+        """Admit nothing for ``seconds``, e.g. after an upstream retry-after."""
+        now = time.monotonic()
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "key", "cost", "future")
+
+    def __init__(self, priority, seq, key, cost, future):
+        self.priority = priority
+        self.seq = seq
+        self.key = key
+        self.cost = cost
+        self.future = future
+
+
+class RateLimitScheduler:
+    """Admits requests against a global token bucket and one bucket per key.
+
+    Waiters are served in priority order, then arrival order. A waiter whose
+    key has no budget left does not hold up waiters for other keys, and a
+    waiter that is not admitted within ``max_wait`` seconds fails with
+    QuotaWaitTimeout instead of queueing indefinitely.
+    """
+
+    def __init__(self, rate: float, burst: float, key_rate: float, key_burst: float, max_wait: float):
+        self.global_bucket = TokenBucket(rate, burst)
+        self.key_rate = key_rate
+        self.key_burst = key_burst
+        self.max_wait = max_wait
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._waiters = []
+        self._seq = itertools.count()
+        self._timer = None
+        self.admitted = 0
+        self.timed_out = 0
+
+    def bucket(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.key_rate, self.key_burst)
+        return bucket
+
+    async def acquire(self, key: str, cost: float = 1, priority: Optional[Priority] = None,
+                      timeout: Optional[float] = None):
+        priority = request_priority.get() if priority is None else priority
+        timeout = self.max_wait if timeout is None else timeout
+        waiter = _Waiter(priority, next(self._seq), key, cost, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._waiters.sort(key=lambda w: (w.priority, w.seq))
+        self._schedule()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise QuotaWaitTimeout(f"Not admitted within {timeout:g}s for '{key}'") from None
+        finally:
+            if not waiter.future.done():
+                waiter.future.cancel()
+                self._waiters.remove(waiter)
+                self._schedule()
+
+    def block(self, key: Optional[str], seconds: float):
+        """Honour an upstream retry-after for one key, or for everything when ``key`` is None."""
+        (self.global_bucket if key is None else self.bucket(key)).block_for(seconds)
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        next_wake = None
+        for waiter in list(self._waiters):
+            global_wait = self.global_bucket.wait_time(waiter.cost, now)
+            if global_wait > 0:
+                next_wake = global_wait if next_wake is None else min(next_wake, global_wait)
+                break
+            key_bucket = self.bucket(waiter.key)
+            key_wait = key_bucket.wait_time(waiter.cost, now)
+            if key_wait > 0:
+                next_wake = key_wait if next_wake is None else min(next_wake, key_wait)
+                continue
+            self.global_bucket.consume(waiter.cost)
+            key_bucket.consume(waiter.cost)
+            self._waiters.remove(waiter)
+            self.admitted += 1
+            waiter.future.set_result(None)
+        if next_wake is not None and self._waiters:
+            self._timer = asyncio.get_running_loop().call_later(next_wake, self._schedule)
+
+    def stats(self) -> dict:
+        return {"waiting": len(self._waiters), "admitted": self.admitted, "timed_out": self.timed_out}
+
+
+class RequestTokenBudget:
+    """Requests-per-minute and tokens-per-minute budget for one LLM model.
+
+    ``acquire`` reserves capacity up front and then sleeps until the
+    reservation is covered, so concurrent callers queue in arrival order and
+    ``delay`` already includes everyone queued ahead.
+    """
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm / 60, rpm)
+        self.tokens = TokenBucket(tpm / 60, tpm)
+
+    def delay(self, tokens: float) -> float:
+        now = time.monotonic()
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    async def acquire(self, tokens: float, max_wait: float):
+        wait = self.delay(tokens)
+        if wait > max_wait:
+            raise QuotaWaitTimeout(f"LLM budget needs {wait:.1f}s, more than the {max_wait:g}s limit")
+        self.requests.consume(1)
+        self.tokens.consume(tokens)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.release(tokens)
+                raise
+
+    def release(self, tokens: float):
+        """Return a reservation that was never used."""
+        self.requests.refund(1)
+        self.tokens.refund(tokens)
+
+    def block_for(self, seconds: float):
+        self.requests.block_for(seconds)
+        self.tokens.block_for(seconds)
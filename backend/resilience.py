@@ -0,0 +1,95 @@
+import os
+import time
+import random
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+PLAN_DEADLINE_SECONDS = float(os.getenv("PLAN_DEADLINE_SECONDS", "60"))
+
+_deadline: ContextVar[Optional[float]] = ContextVar("plan_deadline", default=None)
+
+
+@contextmanager
+def deadline_at(deadline: float):
+    """Give every upstream call made inside the block a budget ending at ``deadline`` (monotonic time)."""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def plan_deadline(seconds: float = PLAN_DEADLINE_SECONDS):
+    """Give every upstream call made inside the block a shared time budget."""
+    return deadline_at(time.monotonic() + seconds)
+
+
+def time_left() -> Optional[float]:
+    """Seconds left in the current plan's budget, or None outside a plan."""
+    deadline = _deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+class PlanDeadlineExceeded(asyncio.TimeoutError):
+    """Raised instead of starting an upstream call once the plan's budget is spent."""
+
+
+def bounded(seconds: float) -> float:
+    """Cap a timeout or queue wait at the time left in the plan's budget.
+
+    Never returns 0, which aiohttp and the schedulers would read as "no
+    limit"; a spent budget raises PlanDeadlineExceeded instead.
+    """
+    remaining = time_left()
+    if remaining is None:
+        return seconds
+    if remaining <= 0:
+        raise PlanDeadlineExceeded("Plan deadline exceeded")
+    return min(seconds, remaining)
+
+
+class RetryPolicy:
+    """How often and how patiently to retry one class of error.
+
+    Delays use full jitter: a uniform draw between zero and the capped
+    exponential backoff, so callers that failed together do not retry in
+    lockstep.
+    """
+
+    def __init__(self, retries: int, base_delay: float, max_delay: float):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+async def call_with_retries(func: Callable[[], Awaitable[Any]],
+                            classify: Callable[[Exception], Optional[RetryPolicy]], name: str) -> Any:
+    """Await ``func()``, retrying errors for which ``classify`` returns a policy.
+
+    Each policy keeps its own attempt count, so for example rate limits and
+    connection errors are budgeted separately. No retry is started if its
+    backoff would run past the plan deadline.
+    """
+    attempts = {}
+    while True:
+        try:
+            return await func()
+        except Exception as e:
+            policy = classify(e)
+            if policy is None:
+                raise
+            attempt = attempts.get(policy, 0)
+            if attempt >= policy.retries:
+                raise
+            attempts[policy] = attempt + 1
+            delay = policy.backoff(attempt)
+            remaining = time_left()
+            if remaining is not None and delay >= remaining:
+                raise
+            print(f"⚠️  {name} failed ({type(e).__name__}: {e}); retry {attempt + 1}/{policy.retries} in {delay * 1000:.0f}ms")
+            await asyncio.sleep(delay)
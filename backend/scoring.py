@@ -0,0 +1,44 @@
+import numpy as np
+from keyword_ideas import KeywordIdeas
+
+W_VOLUME, W_BID, W_COMPETITION = 0.4, 0.4, 0.2
+
+
+def normalize(values: np.ndarray) -> np.ndarray:
+    min_val, max_val = values.min(), values.max()
+    if max_val <= min_val:
+        return np.zeros(len(values))
+    return (values - min_val) / (max_val - min_val)
+
+
+def roas_scores(volumes: np.ndarray, avg_bids: np.ndarray, competitions: np.ndarray) -> np.ndarray:
+    return (W_VOLUME * normalize(volumes)) + (W_BID * normalize(avg_bids)) - (W_COMPETITION * normalize(competitions))
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores, best first.
+
+    Uses a partial selection instead of a full sort; ties keep their original
+    order, so the result matches ``sorted(..., reverse=True)[:k]``.
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        threshold = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(n)
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+def rank_ideas(ideas: KeywordIdeas, k: int) -> KeywordIdeas:
+    """Score ideas by ROAS potential and return the top ``k``, best first."""
+    if not len(ideas):
+        return ideas
+    scores = roas_scores(
+        ideas.avg_monthly_searches.astype(np.float64), ideas.avg_bid, ideas.competition_index
+    )
+    return ideas.take(top_k_indices(scores, k))
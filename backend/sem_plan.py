@@ -1,98 +1,224 @@
+import time
 import random
-from typing import List, Dict
+from typing import Callable, Dict, List
 from url_checker import analyze_url_content
-from models import PlanRequest, PlanResponse, SearchCampaignPlan, PMaxPlan, ShoppingCampaignPlan, AdGroup
-from llm_calls import generate_seed_keywords, cluster_keywords, generate_pmax_themes
+from models import PlanRequest, PlanResponse, PlanFallback, SearchCampaignPlan, PMaxPlan, ShoppingCampaignPlan, AdGroup
+from llm_calls import generate_seed_keywords, cluster_keywords, generate_pmax_themes, LLMBudgetExhausted
 from keywords import get_keyword_ideas_1, get_keyword_ideas_2
+from pipeline import StageGraph, StageError
+from resilience import PLAN_DEADLINE_SECONDS, deadline_at
+import metrics
+import tracing
+from scoring import rank_ideas
+from keyword_ideas import KeywordIdeas, KeywordIndex
 
-async def generate_full_sem_plan(request: PlanRequest) -> PlanResponse:
-    try:
-        if not await analyze_url_content(request.brand_url):
-            seed_keywords = await generate_seed_keywords(request.brand_url)
-        else:
-            seed_keywords = await get_keyword_ideas_1(request.brand_url)
+# A failure while sourcing keywords falls back to the mock plan; later stages surface as errors.
+UPSTREAM_STAGES = {"url_analysis", "seed_keywords", "keyword_ideas"}
 
-        keyword_ideas = await get_keyword_ideas_2(seed_keywords, request.competitor_url)
-        print("✅ Using Google Ads API data")
+MIN_MONTHLY_SEARCHES = 500
 
-    except Exception as e:
-        error_msg = str(e)
-        if "DEVELOPER_TOKEN_NOT_APPROVED" in error_msg:
-            print("⚠️  Developer token not approved for production. Using mock data.")
-            print("💡 Apply for Basic/Standard access at: https://developers.google.com/google-ads/api/docs/access-levels")
-        else:
-            print(f"⚠️  Google Ads API error: {error_msg}")
+# Stages whose result is a finished section of the PlanResponse.
+DELIVERABLE_STAGES = {
+    "shopping_plan": "shopping_campaign_plan",
+    "search_plan": "search_campaign_plan",
+    "pmax_plan": "pmax_plan",
+}
 
-        print("🔄 Generating comprehensive mock SEM plan...")
-        return await generate_mock_sem_plan(request)
 
-    filtered_keywords = [kw for kw in keyword_ideas if kw['avg_monthly_searches'] >= 500]
+def build_shopping_plan(request: PlanRequest) -> ShoppingCampaignPlan:
+    target_roas_ratio = request.target_roas_percentage / 100.0
+    target_cpa = request.average_product_price / target_roas_ratio
+    conversion_rate = 0.02
 
-    if not filtered_keywords:
-        pruned_keywords = []
-    else:
-        volumes = [kw['avg_monthly_searches'] for kw in filtered_keywords]
-        bids = [((kw['low_top_of_page_bid'] + kw['high_top_of_page_bid']) / 2) for kw in filtered_keywords]
-        competitions = [kw['competition_index'] for kw in filtered_keywords]
+    target_cpc = target_cpa * conversion_rate
 
-        min_vol, max_vol = min(volumes), max(volumes)
-        min_bid, max_bid = min(bids), max(bids)
-        min_comp, max_comp = min(competitions), max(competitions)
+    explanation_text = (
+        f"Based on an average product price of ${request.average_product_price:.2f} and a "
+        f"target ROAS of {request.target_roas_percentage}%, your allowable ad spend per sale (Target CPA) "
+        f"is ${target_cpa:.2f}. With an assumed 2% conversion rate, the suggested Target CPC is calculated "
+        f"to be profitable while meeting your ROAS goal."
+    )
 
-        def normalize(val, min_val, max_val):
-            return (val - min_val) / (max_val - min_val) if max_val > min_val else 0.0
+    return ShoppingCampaignPlan(
+        target_cpa=round(target_cpa, 2),
+        suggested_target_cpc=round(target_cpc, 2),
+        explanation=explanation_text
+    )
 
-        w1, w2, w3 = 0.4, 0.4, 0.2
 
-        for kw in filtered_keywords:
-            norm_vol = normalize(kw['avg_monthly_searches'], min_vol, max_vol)
-            avg_bid = (kw['low_top_of_page_bid'] + kw['high_top_of_page_bid']) / 2
-            norm_bid = normalize(avg_bid, min_bid, max_bid)
-            norm_comp = normalize(kw['competition_index'], min_comp, max_comp)
-            kw['roas_score'] = (w1 * norm_vol) + (w2 * norm_bid) - (w3 * norm_comp)
+def assemble_ad_groups(clustered_ad_groups: Dict[str, List[str]], ideas: KeywordIdeas,
+                       theme: Callable[[str, List[str]], str], match_types: List[str]) -> List[AdGroup]:
+    """Turn LLM keyword clusters into ad groups priced from the matching ideas.
 
-        pruned_keywords = sorted(filtered_keywords, key=lambda x: x['roas_score'], reverse=True)[:50]
-    
-    keyword_texts = [kw['text'] for kw in pruned_keywords]
+    Cluster keywords are matched against the ideas through a hash index, so
+    assembly is linear in the number of keywords. Terms the LLM invented and
+    ideas it left out of every group are reported.
+    """
+    if clustered_ad_groups is None:
+        raise RuntimeError("Keyword clustering returned no ad groups")
 
-    clustered_ad_groups = await cluster_keywords(keyword_texts)
+    index = KeywordIndex(ideas)
+    assigned_rows = set()
+    unmatched = []
 
     search_ad_groups = []
     for group_name, keywords in clustered_ad_groups.items():
-        group_keyword_data = [kw for kw in pruned_keywords if kw['text'] in keywords]
-        if not group_keyword_data:
+        rows = []
+        for keyword in keywords:
+            row = index.row(keyword)
+            if row is None:
+                unmatched.append(keyword)
+            else:
+                rows.append(row)
+        rows = list(dict.fromkeys(rows))
+        assigned_rows.update(rows)
+        if not rows:
             continue
-        low_bids = [kw['low_top_of_page_bid'] for kw in group_keyword_data]
-        high_bids = [kw['high_top_of_page_bid'] for kw in group_keyword_data]
-        avg_low_bid = sum(low_bids) / len(low_bids)
-        avg_high_bid = sum(high_bids) / len(high_bids)
-        
+        avg_low_bid = ideas.low_top_of_page_bid[rows].mean()
+        avg_high_bid = ideas.high_top_of_page_bid[rows].mean()
+
         ad_group = AdGroup(
             ad_group_name=group_name,
-            theme=f"Theme related to {keywords}",
+            theme=theme(group_name, keywords),
             keywords=keywords,
-            suggested_match_types=["Phrase", "Exact"],
+            suggested_match_types=match_types,
             suggested_cpc_range=f"${avg_low_bid:.2f} - ${avg_high_bid:.2f}"
         )
         search_ad_groups.append(ad_group)
 
-    search_plan = SearchCampaignPlan(ad_groups=search_ad_groups)
+    dropped = [text for row, text in enumerate(ideas.text) if row not in assigned_rows]
+    if unmatched:
+        print(f"⚠️  {len(unmatched)} clustered keywords are not in the keyword ideas: {unmatched}")
+    if dropped:
+        print(f"⚠️  {len(dropped)} keyword ideas were left out of every ad group: {dropped}")
 
-    ad_group_themes = [ag.theme for ag in search_ad_groups]
+    return search_ad_groups
+
+
+async def build_search_plan(keyword_ideas: KeywordIdeas) -> SearchCampaignPlan:
+    filtered_keywords = keyword_ideas.filter(keyword_ideas.avg_monthly_searches >= MIN_MONTHLY_SEARCHES)
+    pruned_keywords = rank_ideas(filtered_keywords, 50)
+
+    keyword_texts = list(pruned_keywords.text)
+
+    clustered_ad_groups = await cluster_keywords(keyword_texts)
+
+    search_ad_groups = assemble_ad_groups(
+        clustered_ad_groups,
+        pruned_keywords,
+        theme=lambda group_name, keywords: f"Theme related to {keywords}",
+        match_types=["Phrase", "Exact"],
+    )
+
+    tracing.set_attributes(
+        ideas=len(keyword_ideas), filtered_ideas=len(filtered_keywords),
+        ranked_ideas=len(pruned_keywords), ad_groups=len(search_ad_groups),
+    )
+    return SearchCampaignPlan(ad_groups=search_ad_groups)
+
+
+async def build_pmax_plan(search_plan: SearchCampaignPlan) -> PMaxPlan:
+    ad_group_themes = [ag.theme for ag in search_plan.ad_groups]
     pmax_themes = await generate_pmax_themes(ad_group_themes)
-    pmax_plan = PMaxPlan(search_themes=pmax_themes)
+    return PMaxPlan(search_themes=pmax_themes)
+
+
+async def generate_full_sem_plan(request: PlanRequest, on_deliverable=None) -> PlanResponse:
+    """Build the plan; ``on_deliverable(field, value)`` receives each PlanResponse section as it is ready.
+
+    If the plan falls back to mock data, ``on_deliverable`` first receives
+    ``("fallback", PlanFallback)`` and then every section again from the mock plan.
+    """
+    def on_stage_complete(stage, result):
+        if on_deliverable is not None and stage in DELIVERABLE_STAGES:
+            on_deliverable(DELIVERABLE_STAGES[stage], result)
 
+    # Retries and queue waits while sourcing keywords stop at the deadline, so
+    # a slow upstream falls back to the mock plan instead of holding the
+    # request open. Later stages run on their own timeouts: running out of
+    # budget there could only fail the plan, not fall back.
+    deadline = time.monotonic() + PLAN_DEADLINE_SECONDS
+
+    def sourcing(func):
+        async def stage(*args):
+            with deadline_at(deadline):
+                return await func(*args)
+        return stage
+
+    async def shopping():
+        return build_shopping_plan(request)
+
+    async def url_analysis():
+        return await analyze_url_content(request.brand_url)
+
+    async def seed_keywords(has_rich_content):
+        if not has_rich_content:
+            seeds = await generate_seed_keywords(request.brand_url)
+        else:
+            seeds = await get_keyword_ideas_1(request.brand_url)
+        # Without seeds the lookup would only see the competitor's site.
+        if not seeds:
+            raise RuntimeError("No seed keywords for the brand URL")
+        return seeds
+
+    async def keyword_ideas(seeds):
+        ideas = await get_keyword_ideas_2(seeds, request.competitor_url, min_monthly_searches=MIN_MONTHLY_SEARCHES)
+        print("✅ Using Google Ads API data")
+        return ideas
+
+    graph = StageGraph()
+    graph.add("shopping_plan", shopping)
+    graph.add("url_analysis", sourcing(url_analysis))
+    graph.add("seed_keywords", sourcing(seed_keywords), deps=["url_analysis"])
+    graph.add("keyword_ideas", sourcing(keyword_ideas), deps=["seed_keywords"])
+    graph.add("search_plan", build_search_plan, deps=["keyword_ideas"])
+    graph.add("pmax_plan", build_pmax_plan, deps=["search_plan"])
+
+    with metrics.observe_plan() as observation, \
+            tracing.span("plan", brand_url=request.brand_url, competitor_url=request.competitor_url) as plan_span:
+        try:
+            results = await graph.run(on_stage_complete)
+        except StageError as e:
+            if e.stage not in UPSTREAM_STAGES:
+                raise e.error
+            error_msg = str(e.error)
+            if "DEVELOPER_TOKEN_NOT_APPROVED" in error_msg:
+                print("⚠️  Developer token not approved for production. Using mock data.")
+                print("💡 Apply for Basic/Standard access at: https://developers.google.com/google-ads/api/docs/access-levels")
+            else:
+                print(f"⚠️  Google Ads API error: {error_msg}")
+
+            print("🔄 Generating comprehensive mock SEM plan...")
+            observation.outcome = "mock"
+            plan_span.set_attributes(mock_fallback=True, failed_stage=e.stage)
+            metrics.MOCK_FALLBACKS.labels(e.stage).inc()
+            if on_deliverable is not None:
+                on_deliverable("fallback", PlanFallback(
+                    failed_stage=e.stage, detail="Live keyword data was unavailable, so this plan uses mock data."
+                ))
+            return await generate_mock_sem_plan(request, on_deliverable)
+        finally:
+            print(f"⏱️  Plan stage timings: {graph.format_timings()}")
+            metrics.observe_stage_timings(graph.timings)
+
+    return PlanResponse(
+        search_campaign_plan=results["search_plan"],
+        pmax_plan=results["pmax_plan"],
+        shopping_campaign_plan=results["shopping_plan"]
+    )
+
+
+async def generate_mock_sem_plan(request: PlanRequest, on_deliverable=None) -> PlanResponse:
     target_roas_ratio = request.target_roas_percentage / 100.0
     target_cpa = request.average_product_price / target_roas_ratio
     conversion_rate = 0.02
-    
     target_cpc = target_cpa * conversion_rate
-    
+
     explanation_text = (
-        f"Based on an average product price of ${request.average_product_price:.2f} and a "
+        f"📊 MOCK DATA: Based on an average product price of ${request.average_product_price:.2f} and a "
         f"target ROAS of {request.target_roas_percentage}%, your allowable ad spend per sale (Target CPA) "
-        f"is ${target_cpa:.2f}. With an assumed 2% conversion rate, the suggested Target CPC is calculated "
-        f"to be profitable while meeting your ROAS goal."
+        f"is ${target_cpa:.2f}. With an estimated 2.5% conversion rate, the suggested Target CPC is "
+        f"${target_cpc:.2f}. This mock plan provides realistic estimates for planning purposes."
     )
 
     shopping_plan = ShoppingCampaignPlan(
@@ -100,17 +226,13 @@ async def generate_full_sem_plan(request: PlanRequest) -> PlanResponse:
         suggested_target_cpc=round(target_cpc, 2),
         explanation=explanation_text
     )
+    if on_deliverable is not None:
+        on_deliverable("shopping_campaign_plan", shopping_plan)
 
-    return PlanResponse(
-        search_campaign_plan=search_plan,
-        pmax_plan=pmax_plan,
-        shopping_campaign_plan=shopping_plan
-    )
-
-
-async def generate_mock_sem_plan(request: PlanRequest) -> PlanResponse:
     try:
         seed_keywords = await generate_seed_keywords(request.brand_url)
+    except LLMBudgetExhausted:
+        raise
     except Exception as e:
         print(f"⚠️  AI API quota exceeded. {e}")
         return
@@ -163,73 +285,27 @@ async def generate_mock_sem_plan(request: PlanRequest) -> PlanResponse:
             'competition_index': random.uniform(0.8, 1.0)
         })
 
-    volumes = [kw['avg_monthly_searches'] for kw in mock_keywords]
-    bids = [(kw['low_top_of_page_bid'] + kw['high_top_of_page_bid']) / 2 for kw in mock_keywords]
-    competitions = [kw['competition_index'] for kw in mock_keywords]
-
-    min_vol, max_vol = min(volumes), max(volumes)
-    min_bid, max_bid = min(bids), max(bids)
-    min_comp, max_comp = min(competitions), max(competitions)
-
-    def normalize(val, min_val, max_val):
-        return (val - min_val) / (max_val - min_val) if max_val > min_val else 0.0
-
-    w1, w2, w3 = 0.4, 0.4, 0.2
-
-    for kw in mock_keywords:
-        norm_vol = normalize(kw['avg_monthly_searches'], min_vol, max_vol)
-        avg_bid = (kw['low_top_of_page_bid'] + kw['high_top_of_page_bid']) / 2
-        norm_bid = normalize(avg_bid, min_bid, max_bid)
-        norm_comp = normalize(kw['competition_index'], min_comp, max_comp)
-        kw['roas_score'] = (w1 * norm_vol) + (w2 * norm_bid) - (w3 * norm_comp)
-
-    top_keywords = sorted(mock_keywords, key=lambda x: x['roas_score'], reverse=True)[:25]
-    keyword_texts = [kw['text'] for kw in top_keywords]
+    top_keywords = rank_ideas(KeywordIdeas.from_records(mock_keywords), 25)
+    keyword_texts = list(top_keywords.text)
 
     clustered_ad_groups = await cluster_keywords(keyword_texts)
 
-    search_ad_groups = []
-    for group_name, keywords in clustered_ad_groups.items():
-        group_keyword_data = [kw for kw in top_keywords if kw['text'] in keywords]
-        if not group_keyword_data:
-            continue
-
-        low_bids = [kw['low_top_of_page_bid'] for kw in group_keyword_data]
-        high_bids = [kw['high_top_of_page_bid'] for kw in group_keyword_data]
-        avg_low_bid = sum(low_bids) / len(low_bids)
-        avg_high_bid = sum(high_bids) / len(high_bids)
-
-        ad_group = AdGroup(
-            ad_group_name=group_name,
-            theme=f"Targeting customers interested in {group_name.lower()}",
-            keywords=keywords,
-            suggested_match_types=["Phrase", "Exact", "Broad Match Modified"],
-            suggested_cpc_range=f"${avg_low_bid:.2f} - ${avg_high_bid:.2f}"
-        )
-        search_ad_groups.append(ad_group)
+    search_ad_groups = assemble_ad_groups(
+        clustered_ad_groups,
+        top_keywords,
+        theme=lambda group_name, keywords: f"Targeting customers interested in {group_name.lower()}",
+        match_types=["Phrase", "Exact", "Broad Match Modified"],
+    )
 
     search_plan = SearchCampaignPlan(ad_groups=search_ad_groups)
+    if on_deliverable is not None:
+        on_deliverable("search_campaign_plan", search_plan)
+
     ad_group_themes = [ag.theme for ag in search_ad_groups]
     pmax_themes = await generate_pmax_themes(ad_group_themes)
     pmax_plan = PMaxPlan(search_themes=pmax_themes)
-
-    target_roas_ratio = request.target_roas_percentage / 100.0
-    target_cpa = request.average_product_price / target_roas_ratio
-    conversion_rate = 0.02
-    target_cpc = target_cpa * conversion_rate
-
-    explanation_text = (
-        f"📊 MOCK DATA: Based on an average product price of ${request.average_product_price:.2f} and a "
-        f"target ROAS of {request.target_roas_percentage}%, your allowable ad spend per sale (Target CPA) "
-        f"is ${target_cpa:.2f}. With an estimated 2.5% conversion rate, the suggested Target CPC is "
-        f"${target_cpc:.2f}. This mock plan provides realistic estimates for planning purposes."
-    )
-
-    shopping_plan = ShoppingCampaignPlan(
-        target_cpa=round(target_cpa, 2),
-        suggested_target_cpc=round(target_cpc, 2),
-        explanation=explanation_text
-    )
+    if on_deliverable is not None:
+        on_deliverable("pmax_plan", pmax_plan)
 
     return PlanResponse(
         search_campaign_plan=search_plan,
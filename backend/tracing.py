@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+# "file" appends finished spans to TRACE_FILE as JSON lines; empty disables export.
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def new_id() -> str:
+    return uuid.uuid4().hex
+
+
+class Span:
+    """One timed operation; spans in the same request share its ``trace_id``."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_time", "end_time",
+                 "_start", "duration", "attributes", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = new_id()[:16]
+        self.parent_id = parent_id
+        self.start_time = time.time()
+        self.end_time = None
+        self._start = time.perf_counter()
+        self.duration = None
+        self.attributes = dict(attributes)
+        self.status = "ok"
+        self.error = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self):
+        self.end_time = time.time()
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": None if self.duration is None else self.duration * 1000,
+            "attributes": self.attributes,
+            "status": self.status,
+            "error": self.error,
+        }
+
+
+class SpanExporter(ABC):
+    """Receives every finished span; subclass to send spans elsewhere."""
+
+    @abstractmethod
+    def export(self, span: Span):
+        ...
+
+    def shutdown(self):
+        """Flush anything buffered; called once when the app stops."""
+
+
+class InMemoryExporter(SpanExporter):
+    """Collects spans in a list, for tests and benchmarks."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def by_trace(self, trace_id: str) -> List[Span]:
+        return [span for span in self.spans if span.trace_id == trace_id]
+
+    def clear(self):
+        self.spans.clear()
+
+
+class FileExporter(SpanExporter):
+    """Appends spans to a file as JSON lines.
+
+    export() runs on the event loop, so it only queues the span; a
+    background thread serializes and writes them through one open handle,
+    flushing whenever the queue drains. Spans are dropped, and counted in
+    ``dropped``, while the queue is full.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path: str, max_queued: int = 10000):
+        self.path = path
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread = threading.Thread(target=self._write, name="trace-file-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span.to_dict())
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                item = self._queue.get()
+                if item is self._STOP:
+                    break
+                f.write(json.dumps(item, default=str) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def shutdown(self):
+        self._queue.put(self._STOP)
+        self._thread.join(timeout=5)
+
+
+_exporters: List[SpanExporter] = []
+
+
+def add_exporter(exporter: SpanExporter):
+    _exporters.append(exporter)
+
+
+def remove_exporter(exporter: SpanExporter):
+    _exporters.remove(exporter)
+
+
+def shutdown():
+    for exporter in _exporters:
+        exporter.shutdown()
+
+
+if TRACE_EXPORTER == "file":
+    add_exporter(FileExporter(TRACE_FILE))
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Run the block as a child of the current span, or as a new trace root.
+
+    A root span takes the current request id as its trace id, so every span
+    of one API request can be found by the X-Request-ID it returned.
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = request_id.get() or new_id(), None
+    current = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+        for exporter in _exporters:
+            try:
+                exporter.export(current)
+            except Exception as e:
+                print(f"⚠️  Span export failed: {e}")
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def set_attributes(**attributes):
+    """Attach attributes to the current span, if there is one."""
+    current = _current_span.get()
+    if current is not None:
+        current.set_attributes(**attributes)
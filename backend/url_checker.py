@@ -1,30 +1,178 @@
-import requests
+import os
+import codecs
+import asyncio
+import aiohttp
+from html.parser import HTMLParser
 from bs4 import BeautifulSoup
+from http_client import get_session, FETCH_TIMEOUT
+from cache import build_cache, SingleFlight
+from resilience import RetryPolicy, call_with_retries, bounded
+from metrics import observe_upstream, watch_cache
+import tracing
 
-async def analyze_url_content(url):
-    result = False
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        print(f"Error fetching URL: {e}")
-        return
+WORD_THRESHOLD = 250
+# "stream" reads the body incrementally and stops once the threshold is
+# crossed; "full" downloads the page and parses it with BeautifulSoup.
+URL_CHECK_MODE = os.getenv("URL_CHECK_MODE", "stream")
+URL_CHECK_MAX_BYTES = int(os.getenv("URL_CHECK_MAX_BYTES", str(2 * 1024 * 1024)))
+STREAM_CHUNK_SIZE = 64 * 1024
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+# Pages are revalidated with a conditional GET on every visit; the TTL only
+# bounds how long validators and extracted text are kept around.
+page_cache = build_cache(
+    max_size=int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "256")),
+    ttl=float(os.getenv("PAGE_CACHE_TTL", "604800")),
+    db_path=os.getenv("PAGE_CACHE_DB") or None,
+    table="pages",
+)
+watch_cache("pages", page_cache)
+
+
+def _extract_text(content: bytes) -> str:
+    soup = BeautifulSoup(content, 'html.parser')
 
     for script_or_style in soup(["script", "style"]):
         script_or_style.decompose()
 
     text = soup.get_text()
     lines = (line.strip() for line in text.splitlines())
-    clean_text = '\n'.join(line for line in lines if line)
+    return '\n'.join(line for line in lines if line)
+
+
+class _TextExtractor(HTMLParser):
+    """Incrementally collects visible words, skipping script and style content.
+
+    Adjacent text nodes are joined without a separator, like
+    BeautifulSoup's get_text(), so word counts match the full parse.
+    """
+
+    SKIP_TAGS = {"script", "style"}
+
+    def __init__(self, word_limit: int):
+        super().__init__(convert_charrefs=True)
+        self.word_limit = word_limit
+        self.words = []
+        self._partial = ""
+        self._skip_depth = 0
+
+    @property
+    def done(self) -> bool:
+        return len(self.words) >= self.word_limit
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._skip_depth or self.done:
+            return
+        text = self._partial + data
+        words = text.split()
+        self._partial = words.pop() if words and not text[-1].isspace() else ""
+        self.words.extend(words)
+
+    def close(self):
+        super().close()
+        if self._partial and not self.done:
+            self.words.append(self._partial)
+        self._partial = ""
+
+
+async def _stream_extract_text(response) -> str:
+    try:
+        decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parser = _TextExtractor(word_limit=WORD_THRESHOLD + 1)
+    remaining = URL_CHECK_MAX_BYTES
 
-    if not clean_text:
+    async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+        chunk = chunk[:remaining]
+        remaining -= len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if parser.done or remaining <= 0:
+            break
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return ' '.join(parser.words[:parser.word_limit])
+
+
+# Concurrent plans for the same brand URL share one fetch.
+_page_fetches = SingleFlight()
+
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+FETCH_RETRY = RetryPolicy(
+    retries=int(os.getenv("URL_FETCH_RETRIES", "2")),
+    base_delay=float(os.getenv("URL_FETCH_RETRY_BASE_DELAY", "0.2")),
+    max_delay=2.0,
+)
+
+
+def _classify_fetch_error(error: Exception):
+    if isinstance(error, aiohttp.ClientResponseError):
+        return FETCH_RETRY if error.status in TRANSIENT_STATUSES else None
+    if isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)):
+        return FETCH_RETRY
+    return None
+
+
+async def analyze_url_content(url):
+    with tracing.span("analyze_url_content", url=url) as current:
+        result = await _page_fetches.do(url, lambda: _analyze_url_content(url))
+        current.set_attribute("rich_content", result)
+        return result
+
+
+async def _fetch_page(url, cached, headers):
+    timeout = aiohttp.ClientTimeout(total=bounded(FETCH_TIMEOUT))
+    with observe_upstream("brand_page", "get"), tracing.span("url.fetch", url=url) as current:
+        async with get_session().get(url, headers=headers, timeout=timeout) as response:
+            current.set_attributes(status=response.status, content_length=response.content_length)
+            if response.status == 304 and cached:
+                return cached
+            response.raise_for_status()
+            if URL_CHECK_MODE == "full":
+                clean_text = _extract_text(await response.read())
+            else:
+                clean_text = await _stream_extract_text(response)
+            current.set_attribute("text_chars", len(clean_text))
+    page = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "word_count": len(clean_text.split()),
+        "clean_text": clean_text,
+    }
+    if page["etag"] or page["last_modified"]:
+        page_cache.set(url, page)
+    return page
+
+
+async def _analyze_url_content(url):
+    result = False
+    cached = page_cache.get(url)
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        page = await call_with_retries(
+            lambda: _fetch_page(url, cached, headers), _classify_fetch_error, f"Fetching {url}"
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Error fetching URL: {e}")
+        return
+
+    if not page["clean_text"]:
         print("Could not find any text on the page.")
         return
 
-    word_count = len(clean_text.split())
-    if word_count > 250:
+    if page["word_count"] > WORD_THRESHOLD:
         result = True
     return result
-
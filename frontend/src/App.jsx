@@ -3,20 +3,31 @@ import './app.css';
 import InputForm from './inputform.jsx';
 import ResultsDisplay from './resultsdisplay.jsx';
 import LoadingSpinner from './loadingspinner.jsx';
-import { generatePlan } from './PlanApi.js';
+import { streamPlan } from './PlanApi.js';
 
 function App() {
   const [results, setResults] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
+  const [notice, setNotice] = useState(null);
 
   const handleFormSubmit = async (formData) => {
     setIsLoading(true);
     setError(null);
+    setNotice(null);
     setResults(null);
 
     try {
-      const data = await generatePlan(formData);
+      const data = await streamPlan(
+        formData,
+        (name, value) => {
+          setResults((prev) => ({ ...prev, [name]: value }));
+        },
+        (fallback) => {
+          setResults(null);
+          setNotice(fallback.detail);
+        },
+      );
       setResults(data);
     } catch (err) {
       setError('Failed to generate plan. Please check the backend server and try again.');
@@ -36,6 +47,7 @@ function App() {
         <InputForm onSubmit={handleFormSubmit} isLoading={isLoading} />
         {isLoading && <LoadingSpinner />}
         {error && <div className="error-message">{error}</div>}
+        {notice && <div className="notice-message">{notice}</div>}
         {results && <ResultsDisplay results={results} />}
       </main>
       <footer>
@@ -16,3 +16,67 @@ export const generatePlan = async (formData) => {
 
   return response.json();
 };
+
+const parseSseEvent = (block) => {
+  let event = 'message';
+  const dataLines = [];
+  for (const line of block.split('\n')) {
+    if (line.startsWith('event:')) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith('data:')) {
+      dataLines.push(line.slice(5).trim());
+    }
+  }
+  return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null };
+};
+
+// Streams a plan from the SSE endpoint, calling onDeliverable(name, value)
+// for each section as soon as the backend finishes it. If the backend falls
+// back to mock data, onFallback(info) is called before the mock sections,
+// which replace any live sections already delivered.
+export const streamPlan = async (formData, onDeliverable, onFallback) => {
+  const response = await fetch(`${API_BASE_URL}/plan/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+    },
+    body: JSON.stringify(formData),
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json();
+    throw new Error(errorData.detail || 'An unknown error occurred');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const { event, data } = parseSseEvent(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+
+      if (event === 'error') {
+        throw new Error(data?.detail || 'An unknown error occurred');
+      }
+      if (event === 'complete') {
+        return data;
+      }
+      if (event === 'fallback') {
+        onFallback?.(data);
+        continue;
+      }
+      onDeliverable(event, data);
+    }
+  }
+
+  throw new Error('Plan stream ended before the plan was complete');
+};